@@ -3,6 +3,7 @@ Database configuration and utilities
 """
 import os
 from dotenv import load_dotenv
+from psycopg_pool import AsyncConnectionPool
 
 load_dotenv()
 
@@ -14,3 +15,55 @@ DB_CONFIG = {
     'dbname': os.getenv('POSTGRES_DB'),  # psycopg uses 'dbname' not 'database'
     'port': int(os.getenv('POSTGRES_PORT'))
 }
+
+# Connection pool config
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))  # seconds to wait for a free connection
+DB_POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', '300'))  # close idle connections above min_size
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', '3600'))  # recycle connections
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '5000'))
+
+# App-wide async connection pool, opened/closed in the FastAPI lifespan
+pool = AsyncConnectionPool(
+    conninfo="",
+    kwargs={
+        **DB_CONFIG,
+        'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}',
+    },
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    max_idle=DB_POOL_MAX_IDLE,
+    max_lifetime=DB_POOL_MAX_LIFETIME,
+    name="cospa-api",
+    open=False,
+)
+
+async def open_pool():
+    """Open the pool; connections are established in the background"""
+    await pool.open()
+
+async def close_pool():
+    """Close the pool and all its connections"""
+    await pool.close()
+
+async def get_db():
+    """
+    FastAPI dependency yielding a pooled connection for the whole request
+    The connection is rolled back on error and returned to the pool afterwards
+    """
+    async with pool.connection() as conn:
+        yield conn
+
+def get_pool() -> AsyncConnectionPool:
+    """
+    FastAPI dependency returning the pool itself
+    Use for handlers that should only hold a connection around their DB work
+    (e.g. not across a slow LLM call)
+    """
+    return pool
+
+def get_pool_stats() -> dict:
+    """Pool counters (size, available, waiting, requests, errors...) for monitoring"""
+    return pool.get_stats()
@@ -3,6 +3,8 @@ FastAPI backend for CoSpa - Location discovery chat API
 Integrates with OpenAI GPT-4o (latest), Qdrant vector search, and PostgreSQL
 """
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
@@ -15,15 +17,37 @@ from routes.chat import router as chat_router
 from routes.wifi import router as wifi_router
 from routes.saved_locations import router as saved_locations_router
 from routes.reviews import router as reviews_router
+from routes.sites import router as sites_router
+from routes.search import router as search_router
+from config.database import pool, open_pool, close_pool, get_pool_stats
+from services.embeddings import embedding_cache, embedding_batcher
+from services.spatial_index import spatial_index, run_spatial_index_refresh
+from services.search import search_backend, lexical_index, run_lexical_index_refresh, search_cache_stats, HYBRID_SEARCH_ENABLED
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown of shared resources"""
+    await open_pool()
+    await embedding_batcher.start()
+    spatial_index_task = asyncio.create_task(run_spatial_index_refresh(pool))
+    lexical_index_task = asyncio.create_task(run_lexical_index_refresh()) if HYBRID_SEARCH_ENABLED else None
+    yield
+    spatial_index_task.cancel()
+    if lexical_index_task:
+        lexical_index_task.cancel()
+    await embedding_batcher.stop()
+    await search_backend.close()
+    await close_pool()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="CoSpa API",
     description="Location discovery chat API with semantic search",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -42,6 +66,8 @@ app.include_router(chat_router)
 app.include_router(wifi_router, prefix="/api/wifi", tags=["wifi"])
 app.include_router(saved_locations_router, prefix="/api/saved-locations", tags=["saved-locations"])
 app.include_router(reviews_router, prefix="/api/reviews", tags=["reviews"])
+app.include_router(sites_router)
+app.include_router(search_router)
 
 # Health check endpoints
 @app.get("/")
@@ -60,7 +86,14 @@ async def health_check():
         "status": "healthy",
         "openai": "connected" if os.getenv("OPENAI_API_KEY") else "not configured",
         "qdrant": "connected" if os.getenv("QDRANT_API_KEY") else "not configured",
-        "postgres": "configured" if os.getenv("POSTGRES_HOST") else "not configured"
+        "postgres": "configured" if os.getenv("POSTGRES_HOST") else "not configured",
+        "postgres_pool": get_pool_stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "embedding_batcher": embedding_batcher.stats(),
+        "search_backend": search_backend.stats(),
+        "spatial_index": spatial_index.stats(),
+        "lexical_index": lexical_index.stats(),
+        "search_cache": search_cache_stats()
     }
 
 if __name__ == "__main__":
@@ -2,7 +2,7 @@
 Pydantic models for request/response validation
 """
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 class UserSync(BaseModel):
     clerk_id: str
@@ -24,6 +24,7 @@ class ChatRequest(BaseModel):
     user_id: Optional[str] = None  # For authenticated users
     history: Optional[List[ChatMessage]] = []
     user_location: Optional[dict] = None
+    sort_by: Literal["relevance", "distance"] = "relevance"  # "distance" needs user_location
 
 class LocationResult(BaseModel):
     id: str
@@ -47,3 +48,31 @@ class LocationResult(BaseModel):
 class ChatResponse(BaseModel):
     reply: str
     locations: List[LocationResult]
+
+class NearbyResponse(BaseModel):
+    locations: List[LocationResult]
+    count: int
+
+class SearchResponse(BaseModel):
+    locations: List[LocationResult]
+    count: int  # Locations in this page
+    total: int  # Locations reachable through paging (capped)
+    next_cursor: Optional[str] = None  # Pass as `cursor` for the next page; None on the last page
+
+class BatchSearchQuery(BaseModel):
+    query: str
+    user_location: Optional[dict] = None  # Overrides the request-level location
+    limit: Optional[int] = None  # Overrides the request-level limit
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchSearchQuery]
+    user_location: Optional[dict] = None  # Shared by all queries
+    limit: int = 5
+    sort_by: Literal["relevance", "distance"] = "relevance"
+
+class BatchSearchResult(BaseModel):
+    query: str
+    locations: List[LocationResult]
+
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchResult]
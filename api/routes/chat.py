@@ -1,155 +1,210 @@
 """
 Chat routes with OpenAI integration
 """
-from fastapi import APIRouter, HTTPException
-import psycopg
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+import json
 import os
-from openai import OpenAI
-from models.schemas import ChatRequest, ChatResponse, LocationResult
-from config.database import DB_CONFIG
-from services.search import search_locations, create_system_prompt
+from typing import List, Optional
+from openai import AsyncOpenAI
+from psycopg_pool import AsyncConnectionPool
+from models.schemas import ChatRequest, ChatResponse
+from config.database import get_pool
+from services.search import search_locations, create_system_prompt, format_locations
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Initialize OpenAI client (async so completions don't block the event loop)
+openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+OPENAI_MODEL = "gpt-4o"  # Latest GPT-4o model (automatically uses newest version)
+OPENAI_TEMPERATURE = 0.7
+OPENAI_MAX_TOKENS = 800  # Increased for more detailed responses
+
+async def check_message_limit(pool: AsyncConnectionPool, conversation_id: Optional[str]):
+    """Raise 400 if the conversation already has 10 messages"""
+    if not conversation_id:
+        return
+
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                SELECT COUNT(*) FROM chat_messages
+                WHERE conversation_id = %s
+            """, (conversation_id,))
+            message_count = (await cur.fetchone())[0]
+
+            if message_count >= 10:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Cuộc hội thoại đã đạt giới hạn 10 tin nhắn. Vui lòng tạo cuộc hội thoại mới."
+                )
+
+def build_messages(request: ChatRequest, locations: List[dict]) -> List[dict]:
+    """OpenAI messages: system prompt with location context, history, current message"""
+    # Create system prompt with location context and user location
+    system_prompt = create_system_prompt(locations, user_location=request.user_location)
+
+    messages = [
+        {"role": "system", "content": system_prompt}
+    ]
+
+    # Add conversation history
+    for msg in request.history:
+        messages.append({
+            "role": msg.role,
+            "content": msg.content
+        })
+
+    # Add current user message
+    messages.append({
+        "role": "user",
+        "content": request.message
+    })
+
+    return messages
+
+async def save_chat_turn(pool: AsyncConnectionPool, conversation_id: Optional[str], message: str, reply: str, locations: List[dict]):
+    """Persist user message, assistant reply and linked search results"""
+    if not conversation_id:
+        return
+
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            # Save user message
+            await cur.execute("""
+                INSERT INTO chat_messages (conversation_id, role, content)
+                VALUES (%s, 'user', %s)
+                RETURNING id
+            """, (conversation_id, message))
+
+            # Save assistant message
+            await cur.execute("""
+                INSERT INTO chat_messages (conversation_id, role, content)
+                VALUES (%s, 'assistant', %s)
+                RETURNING id
+            """, (conversation_id, reply))
+            assistant_message_id = (await cur.fetchone())[0]
+
+            # Save search results linked to assistant message
+            for idx, loc in enumerate(locations):
+                await cur.execute("""
+                    INSERT INTO chat_search_results (message_id, site_id, rank, relevance_score)
+                    VALUES (%s, %s, %s, %s)
+                """, (assistant_message_id, loc['id'], idx + 1, loc.get('score', 0.0)))
+
+            # Update conversation updated_at
+            await cur.execute("""
+                UPDATE chat_conversations
+                SET updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (conversation_id,))
+
+            await conn.commit()
+
+def sse_event(event: str, data) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, pool: AsyncConnectionPool = Depends(get_pool)):
     """
     Chat endpoint with location search and conversation tracking
     Uses OpenAI GPT-4o (latest version) for intelligent conversation
     Limit: Max 10 messages per conversation
+    Pooled connections are only held around DB work, not across the LLM call
     """
     try:
         conversation_id = request.conversation_id
-        
+
         # Check message limit if conversation_id provided
-        if conversation_id:
-            with psycopg.connect(**DB_CONFIG) as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        SELECT COUNT(*) FROM chat_messages 
-                        WHERE conversation_id = %s
-                    """, (conversation_id,))
-                    message_count = cur.fetchone()[0]
-                    
-                    if message_count >= 10:
-                        raise HTTPException(
-                            status_code=400,
-                            detail="Cuộc hội thoại đã đạt giới hạn 10 tin nhắn. Vui lòng tạo cuộc hội thoại mới."
-                        )
-        
+        await check_message_limit(pool, conversation_id)
+
         # Search for relevant locations with user location filter
-        locations = search_locations(request.message, limit=5, user_location=request.user_location)
-        
-        # Create system prompt with location context and user location
-        system_prompt = create_system_prompt(locations, user_location=request.user_location)
-        
-        # Prepare messages for OpenAI
-        messages = [
-            {"role": "system", "content": system_prompt}
-        ]
-        
-        # Add conversation history
-        for msg in request.history:
-            messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-        
-        # Add current user message
-        messages.append({
-            "role": "user",
-            "content": request.message
-        })
-        
+        locations = await search_locations(request.message, limit=5, user_location=request.user_location, sort_by=request.sort_by)
+
         # Call OpenAI API with latest GPT-4o model
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",  # Latest GPT-4o model (automatically uses newest version)
-            messages=messages,
-            temperature=0.7,
-            max_tokens=800  # Increased for more detailed responses
+        response = await openai_client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=build_messages(request, locations),
+            temperature=OPENAI_TEMPERATURE,
+            max_tokens=OPENAI_MAX_TOKENS
         )
-        
+
         reply = response.choices[0].message.content
-        
+
         # Save messages to database if conversation_id provided
-        if conversation_id:
-            with psycopg.connect(**DB_CONFIG) as conn:
-                with conn.cursor() as cur:
-                    # Save user message
-                    cur.execute("""
-                        INSERT INTO chat_messages (conversation_id, role, content)
-                        VALUES (%s, 'user', %s)
-                        RETURNING id
-                    """, (conversation_id, request.message))
-                    user_message_id = cur.fetchone()[0]
-                    
-                    # Save assistant message
-                    cur.execute("""
-                        INSERT INTO chat_messages (conversation_id, role, content)
-                        VALUES (%s, 'assistant', %s)
-                        RETURNING id
-                    """, (conversation_id, reply))
-                    assistant_message_id = cur.fetchone()[0]
-                    
-                    # Save search results linked to assistant message
-                    for idx, loc in enumerate(locations):
-                        cur.execute("""
-                            INSERT INTO chat_search_results (message_id, site_id, rank, relevance_score)
-                            VALUES (%s, %s, %s, %s)
-                        """, (assistant_message_id, loc['id'], idx + 1, loc.get('score', 0.0)))
-                    
-                    # Update conversation updated_at
-                    cur.execute("""
-                        UPDATE chat_conversations 
-                        SET updated_at = CURRENT_TIMESTAMP 
-                        WHERE id = %s
-                    """, (conversation_id,))
-                    
-                    conn.commit()
-        
-        # Format locations for response
-        location_results = []
-        for loc in locations:
-            # Generate mock amenities based on type
-            amenities = []
-            if loc['type'] in ['Cafe', 'cafe']:
-                amenities = ['wifi', 'coffee', 'seating']
-            elif loc['type'] in ['Coworking', 'coworking space']:
-                amenities = ['wifi', 'meeting rooms', 'quiet space']
-            
-            # Calculate distance (mock for now)
-            distance = f"{round(loc.get('score', 0) * 10, 1)} km"
-            
-            location_results.append(LocationResult(
-                id=loc['id'],
-                name=loc['name'],
-                type=loc['type'],
-                brand=loc.get('brand'),
-                rating=loc.get('rating'),
-                review_count=loc.get('review_count'),
-                address=loc['address'],
-                distance=distance,
-                lat=loc.get('lat'),
-                lng=loc.get('lng'),
-                phone_number=loc.get('phone_number'),
-                link_google=loc.get('link_google'),
-                link_web=loc.get('link_web'),
-                thumbnail_url=loc.get('thumbnail_url') or "https://cdn.xanhsm.com/2025/02/13cba011-cafe-sang-sai-gon-4.jpg",
-                amenities=amenities,
-                isSponsored=False,  # Can be enhanced with actual sponsored data
-                description=f"Great {loc['type'].lower()} in {loc['address'].split(',')[-1].strip() if ',' in loc['address'] else 'Vietnam'}"
-            ))
-        
+        await save_chat_turn(pool, conversation_id, request.message, reply, locations)
+
         return ChatResponse(
             reply=reply,
-            locations=location_results
+            locations=format_locations(locations)
         )
-        
+
     except HTTPException:
         raise
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, pool: AsyncConnectionPool = Depends(get_pool)):
+    """
+    Streaming chat endpoint (Server-Sent Events)
+    Events, in order:
+      - `locations`: location cards, sent as soon as search finishes
+      - `delta`: `{"content": ...}` token deltas from GPT-4o
+      - `done`: `{"reply": ...}` once the turn has been saved to the database
+      - `error`: `{"detail": ...}` if anything fails mid-stream
+    Limit: Max 10 messages per conversation (checked before the stream starts)
+    """
+    try:
+        await check_message_limit(pool, request.conversation_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in chat stream endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def event_stream():
+        try:
+            # Search for relevant locations with user location filter
+            locations = await search_locations(request.message, limit=5, user_location=request.user_location, sort_by=request.sort_by)
+            yield sse_event("locations", [loc.model_dump() for loc in format_locations(locations)])
+
+            stream = await openai_client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=build_messages(request, locations),
+                temperature=OPENAI_TEMPERATURE,
+                max_tokens=OPENAI_MAX_TOKENS,
+                stream=True
+            )
+
+            reply_parts = []
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    reply_parts.append(content)
+                    yield sse_event("delta", {"content": content})
+
+            reply = "".join(reply_parts)
+
+            # Save messages to database if conversation_id provided
+            await save_chat_turn(pool, request.conversation_id, request.message, reply, locations)
+
+            yield sse_event("done", {"reply": reply})
+
+        except Exception as e:
+            print(f"Error in chat stream endpoint: {e}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable proxy buffering
+        }
+    )
@@ -0,0 +1,153 @@
+"""
+Search routes (no LLM involved) and search maintenance
+"""
+from fastapi import APIRouter, HTTPException, Header, Query
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+from typing import Literal, Optional
+from models.schemas import SearchResponse, BatchSearchRequest, BatchSearchResponse, BatchSearchResult
+from services.backends import SearchFilters
+from services.embeddings import normalize_query
+from services.geo import geohash_encode
+from services.search import (
+    search_page, search_locations_batch, format_locations,
+    invalidate_search_cache, search_cache_stats, refresh_lexical_index,
+    HYBRID_SEARCH_ENABLED, SEARCH_RADIUS_KM, SEARCH_CACHE_GEOHASH_PRECISION
+)
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+# Shared secret for maintenance calls (e.g. from db/import_to_qdrant.py); unset disables them
+SEARCH_ADMIN_TOKEN = os.getenv("SEARCH_ADMIN_TOKEN")
+
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "20"))
+SEARCH_MAX_LIMIT = 50
+
+def check_admin_token(token: Optional[str]):
+    if not SEARCH_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Search maintenance is disabled (SEARCH_ADMIN_TOKEN not set)")
+    if not token or not hmac.compare_digest(token, SEARCH_ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+def _search_fingerprint(*parts) -> str:
+    """Ties a cursor to the query, filters, sort and location cell it was issued for"""
+    return hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+def encode_cursor(offset: int, fingerprint: str) -> str:
+    raw = json.dumps({"o": offset, "f": fingerprint}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, fingerprint: str) -> int:
+    """Offset stored in a cursor; 400 if it is malformed or belongs to another search"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset = int(data["o"])
+        cursor_fingerprint = data["f"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_fingerprint != fingerprint or offset < 0:
+        raise HTTPException(status_code=400, detail="Cursor does not match this search")
+    return offset
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, description="Search text"),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    radius: Optional[float] = Query(None, gt=0, le=100, description=f"Radius in km around lat/lng (default {SEARCH_RADIUS_KM})"),
+    type: Optional[str] = Query(None, description="Site type as stored, e.g. Cafe"),
+    city: Optional[str] = Query(None, description="City as stored"),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    sort_by: Literal["relevance", "distance"] = "relevance",
+    limit: int = Query(10, ge=1, le=SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
+    """
+    Semantic location search without the LLM, paginated with an opaque cursor
+    Pages slice one cached ranking of up to SEARCH_PAGE_DEPTH results, so paging is stable
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty")
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="lat and lng must be given together")
+    if lat is None and (radius is not None or sort_by == "distance"):
+        raise HTTPException(status_code=400, detail="radius and sort_by=distance need lat and lng")
+
+    user_location = {'lat': lat, 'lng': lng} if lat is not None else None
+    filters = SearchFilters(radius_km=radius, type=type, city=city, min_rating=min_rating)
+    cell = geohash_encode(lat, lng, SEARCH_CACHE_GEOHASH_PRECISION) if user_location else None
+    fingerprint = _search_fingerprint(normalize_query(q), cell, radius, type, city, min_rating, sort_by)
+    offset = decode_cursor(cursor, fingerprint) if cursor else 0
+
+    try:
+        locations, total = await search_page(q, offset, limit, user_location, sort_by, filters)
+    except Exception as e:
+        print(f"Error in search endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    next_offset = offset + len(locations)
+    return SearchResponse(
+        locations=format_locations(locations),
+        count=len(locations),
+        total=total,
+        next_cursor=encode_cursor(next_offset, fingerprint) if locations and next_offset < total else None
+    )
+
+@router.post("/batch", response_model=BatchSearchResponse)
+async def search_batch(request: BatchSearchRequest):
+    """
+    Run several searches at once, e.g. "cafe", "coworking" and "nhà hàng" around one location
+    Queries are embedded in one batch and sent to the vector backend as one batch search
+    Each query may override the shared `user_location` and `limit`
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="At least one query is required")
+    if len(request.queries) > SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch")
+
+    searches = []
+    for item in request.queries:
+        limit = item.limit or request.limit
+        if not item.query.strip():
+            raise HTTPException(status_code=400, detail="Queries must not be empty")
+        if not 1 <= limit <= SEARCH_MAX_LIMIT:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SEARCH_MAX_LIMIT}")
+        searches.append({
+            'query': item.query,
+            'limit': limit,
+            'user_location': item.user_location or request.user_location,
+            'sort_by': request.sort_by,
+        })
+
+    try:
+        results = await search_locations_batch(searches)
+    except Exception as e:
+        print(f"Error in batch search endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return BatchSearchResponse(results=[
+        BatchSearchResult(query=search['query'], locations=format_locations(locations))
+        for search, locations in zip(searches, results)
+    ])
+
+@router.post("/cache/invalidate")
+async def invalidate_cache(x_admin_token: Optional[str] = Header(None)):
+    """
+    Drop cached search results and rebuild the lexical index
+    Call after the Qdrant collection has been re-imported
+    """
+    check_admin_token(x_admin_token)
+
+    invalidate_search_cache()
+    if HYBRID_SEARCH_ENABLED:
+        try:
+            await refresh_lexical_index()
+        except Exception as e:
+            print(f"Error refreshing lexical index: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return {"message": "Search cache invalidated", "cache": search_cache_stats()}
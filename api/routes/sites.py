@@ -0,0 +1,31 @@
+"""
+Site routes served from the in-process spatial index
+"""
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from models.schemas import NearbyResponse
+from services.search import format_locations
+from services.spatial_index import spatial_index
+
+router = APIRouter(prefix="/api/sites", tags=["sites"])
+
+@router.get("/nearby", response_model=NearbyResponse)
+async def get_nearby_sites(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(1.0, gt=0, le=50, description="Radius in km"),
+    type: Optional[str] = Query(None, description="Site type, e.g. Cafe"),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Sites within `radius` km of a point, nearest first
+    Fast path for map panning and "near me" (no embedding model, LLM or DB round trip)
+    """
+    if not spatial_index.ready:
+        raise HTTPException(status_code=503, detail="Spatial index is still loading")
+
+    locations = spatial_index.nearby(lat, lng, radius, site_type=type, limit=limit)
+    return NearbyResponse(
+        locations=format_locations(locations),
+        count=len(locations)
+    )
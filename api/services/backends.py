@@ -0,0 +1,407 @@
+"""
+Vector search backends
+- qdrant: the hosted Qdrant collection (default)
+- local: an exported snapshot of the collection searched in-process
+  (memory-mapped float32 matrix, exact dot-product search); no network,
+  usable offline for CI and local performance testing
+Both return locations as dicts: {'id': site id, 'point_id': str, 'score': float, **LOCATION_FIELDS}
+"""
+import asyncio
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import Filter, FieldCondition, GeoRadius, GeoPoint, MatchValue, Range, SearchRequest
+from services.geo import haversine_many
+
+BACKENDS = ("qdrant", "local")
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "qdrant")
+# Alias switched by db/import_to_qdrant.py after each full rebuild (blue/green)
+COLLECTION_NAME = "cospa_sites"
+# Directory written by db/export_local_index.py
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "local_index")
+
+# Qdrant client: gRPC transport, per-call deadline and optional hedged searches
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true"
+QDRANT_SEARCH_TIMEOUT_MS = float(os.getenv("QDRANT_SEARCH_TIMEOUT_MS", "1500"))
+QDRANT_HEDGE_ENABLED = os.getenv("QDRANT_HEDGE_ENABLED", "false").lower() == "true"
+QDRANT_HEDGE_MIN_DELAY_MS = float(os.getenv("QDRANT_HEDGE_MIN_DELAY_MS", "20"))  # floor for the p95 delay
+QDRANT_LATENCY_WINDOW = int(os.getenv("QDRANT_LATENCY_WINDOW", "500"))  # searches in the rolling p95
+
+# Payload fields the API reads from a hit (see format_locations / create_system_prompt);
+# search_text and links for other clients are never transferred on the search path
+LOCATION_FIELDS = [
+    'id', 'name', 'type', 'brand', 'city', 'address', 'rating', 'review_count', 'lat', 'lng',
+    'phone_number', 'link_google', 'link_web', 'thumbnail_url',
+]
+
+def geo_radius_filter(lat: float, lng: float, radius_km: float) -> Filter:
+    """Qdrant filter on the indexed `location` payload field"""
+    return Filter(must=[
+        FieldCondition(
+            key="location",
+            geo_radius=GeoRadius(
+                center=GeoPoint(lat=lat, lon=lng),
+                radius=radius_km * 1000  # meters
+            )
+        )
+    ])
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """
+    Restrictions applied inside the backend, before the top-k is taken
+    center/radius_km: (lat, lng) and radius; type and city match the stored value exactly
+    """
+    center: Optional[tuple] = None
+    radius_km: Optional[float] = None
+    type: Optional[str] = None
+    city: Optional[str] = None
+    min_rating: Optional[float] = None
+
+    def matches(self, payload: dict) -> bool:
+        """Attribute filters (not geo) for hits that did not come from the backend"""
+        if self.type is not None and payload.get('type') != self.type:
+            return False
+        if self.city is not None and payload.get('city') != self.city:
+            return False
+        if self.min_rating is not None and (payload.get('rating') or 0.0) < self.min_rating:
+            return False
+        return True
+
+    def to_qdrant(self) -> Optional[Filter]:
+        """Qdrant filter on the indexed `location`, `type`, `city` and `rating` payload fields"""
+        must = []
+        if self.center:
+            must.append(geo_radius_filter(self.center[0], self.center[1], self.radius_km).must[0])
+        if self.type is not None:
+            must.append(FieldCondition(key="type", match=MatchValue(value=self.type)))
+        if self.city is not None:
+            must.append(FieldCondition(key="city", match=MatchValue(value=self.city)))
+        if self.min_rating is not None:
+            must.append(FieldCondition(key="rating", range=Range(gte=self.min_rating)))
+        return Filter(must=must) if must else None
+
+def _hit(point, score: float) -> dict:
+    """Location dict for a Qdrant point; the payload `id` (site UUID) wins over the point id"""
+    return {'id': str(point.id), 'point_id': str(point.id), 'score': score, **point.payload}
+
+def _point_id(point_id: str):
+    """Qdrant ids are integers or UUID strings; locations carry them as str"""
+    return int(point_id) if point_id.isdigit() else point_id
+
+class SearchBackend(ABC):
+    """Nearest-neighbour search over site vectors with optional filters"""
+
+    name = ""
+
+    @abstractmethod
+    async def search(self, vector: np.ndarray, limit: int, filters: Optional[SearchFilters] = None) -> List[dict]:
+        """Top `limit` locations by cosine similarity among points matching `filters`"""
+
+    async def search_batch(self, searches: List[tuple]) -> List[List[dict]]:
+        """One result list per (vector, limit, filters), in order"""
+        return await asyncio.gather(*(self.search(*search) for search in searches))
+
+    @abstractmethod
+    async def retrieve(self, point_ids: List[str]) -> List[dict]:
+        """Locations by point id (score 0.0); unknown ids are skipped"""
+
+    @abstractmethod
+    async def documents(self, fields: List[str]) -> List[dict]:
+        """Every point as {'point_id': str, **selected payload fields}"""
+
+    async def close(self):
+        """Release connections (called on app shutdown)"""
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+class QdrantBackend(SearchBackend):
+    """
+    Hosted Qdrant collection over one AsyncQdrantClient (gRPC by default) kept for the app lifetime
+    Searches and retrieves are bounded by `timeout_ms`. With hedging on, a search that has
+    not answered after the rolling p95 latency is sent a second time; the first reply wins
+    """
+
+    name = "qdrant"
+
+    def __init__(self, url: Optional[str], api_key: Optional[str], collection_name: str = COLLECTION_NAME,
+                 prefer_grpc: bool = QDRANT_PREFER_GRPC, timeout_ms: float = QDRANT_SEARCH_TIMEOUT_MS,
+                 hedge: bool = QDRANT_HEDGE_ENABLED, hedge_min_delay_ms: float = QDRANT_HEDGE_MIN_DELAY_MS):
+        self.client = AsyncQdrantClient(url=url, api_key=api_key, prefer_grpc=prefer_grpc)
+        self.collection_name = collection_name
+        self.prefer_grpc = prefer_grpc
+        self.timeout = timeout_ms / 1000
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay_ms / 1000
+        self.latencies = deque(maxlen=QDRANT_LATENCY_WINDOW)
+        self.searches = 0
+        # Batches take longer than single searches, so they get their own window and p95
+        self.batch_latencies = deque(maxlen=QDRANT_LATENCY_WINDOW)
+        self.batch_searches = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self, latencies: Optional[deque] = None) -> float:
+        """Rolling p95 of `latencies` (single searches by default) in seconds, the timeout until enough samples exist"""
+        latencies = self.latencies if latencies is None else latencies
+        if len(latencies) < 20:
+            return self.timeout
+        return max(float(np.percentile(latencies, 95)), self.hedge_min_delay)
+
+    async def _hedged(self, call: Callable[[], Awaitable], latencies: Optional[deque] = None):
+        first = asyncio.ensure_future(call())
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(latencies))
+            if not done:
+                self.hedges += 1
+                tasks.append(asyncio.ensure_future(call()))
+
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                if not pending:
+                    raise done.pop().exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _with_deadline(self, call: Callable[[], Awaitable], what: str):
+        try:
+            return await asyncio.wait_for(call(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise TimeoutError(f"Qdrant {what} exceeded {self.timeout * 1000:.0f} ms")
+
+    async def search(self, vector, limit, filters=None):
+        query_vector = np.asarray(vector, dtype=np.float32).tolist()
+        query_filter = filters.to_qdrant() if filters else None
+
+        def call():
+            return self.client.search(
+                collection_name=self.collection_name,
+                query_vector=query_vector,
+                query_filter=query_filter,
+                limit=limit,
+                with_payload=LOCATION_FIELDS,
+                with_vectors=False
+            )
+
+        started = time.perf_counter()
+        self.searches += 1
+        results = await self._with_deadline(lambda: self._hedged(call) if self.hedge else call(), "search")
+        self.latencies.append(time.perf_counter() - started)
+        return [_hit(result, result.score) for result in results]
+
+    async def search_batch(self, searches):
+        requests = [
+            SearchRequest(
+                vector=np.asarray(vector, dtype=np.float32).tolist(),
+                filter=filters.to_qdrant() if filters else None,
+                limit=limit,
+                with_payload=LOCATION_FIELDS,
+                with_vector=False
+            )
+            for vector, limit, filters in searches
+        ]
+
+        def call():
+            return self.client.search_batch(collection_name=self.collection_name, requests=requests)
+
+        started = time.perf_counter()
+        self.batch_searches += 1
+        batches = await self._with_deadline(
+            lambda: self._hedged(call, self.batch_latencies) if self.hedge else call(), "batch search"
+        )
+        self.batch_latencies.append(time.perf_counter() - started)
+        return [[_hit(result, result.score) for result in results] for results in batches]
+
+    async def retrieve(self, point_ids):
+        points = await self._with_deadline(lambda: self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=[_point_id(point_id) for point_id in point_ids],
+            with_payload=LOCATION_FIELDS,
+            with_vectors=False
+        ), "retrieve")
+        return [_hit(point, 0.0) for point in points]
+
+    async def documents(self, fields):
+        # Background refresh only; no deadline
+        documents = []
+        offset = None
+        while True:
+            points, offset = await self.client.scroll(
+                collection_name=self.collection_name,
+                limit=1000,
+                offset=offset,
+                with_payload=fields,
+                with_vectors=False
+            )
+            documents.extend({'point_id': str(point.id), **point.payload} for point in points)
+            if offset is None:
+                return documents
+
+    async def close(self):
+        await self.client.close()
+
+    def stats(self) -> dict:
+        latencies = np.array(self.latencies) * 1000
+        batch_latencies = np.array(self.batch_latencies) * 1000
+        return {
+            "backend": self.name,
+            "collection": self.collection_name,
+            "grpc": self.prefer_grpc,
+            "timeout_ms": self.timeout * 1000,
+            "searches": self.searches,
+            "timeouts": self.timeouts,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2) if len(latencies) else None,
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2) if len(latencies) else None,
+            "batch_searches": self.batch_searches,
+            "batch_p50_ms": round(float(np.percentile(batch_latencies, 50)), 2) if len(batch_latencies) else None,
+            "batch_p95_ms": round(float(np.percentile(batch_latencies, 95)), 2) if len(batch_latencies) else None,
+            "hedging": self.hedge,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+class LocalBackend(SearchBackend):
+    """
+    Exact search over an exported collection snapshot
+    Directory layout (see db/export_local_index.py):
+      vectors.npy   - (n, dim) float32, L2-normalized, opened memory-mapped
+      points.jsonl  - one {"id": ..., "payload": {...}} per row, same order
+      meta.json     - collection, model and export time
+    """
+
+    name = "local"
+
+    def __init__(self, path: str = LOCAL_INDEX_PATH):
+        started = time.perf_counter()
+        self.path = Path(path)
+        if not (self.path / "vectors.npy").exists():
+            raise FileNotFoundError(f"No local index at '{self.path}' (run db/export_local_index.py)")
+
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self.ids: List[str] = []
+        self.payloads: List[dict] = []
+        with open(self.path / "points.jsonl", encoding="utf-8") as f:
+            for line in f:
+                point = json.loads(line)
+                self.ids.append(str(point["id"]))
+                self.payloads.append(point["payload"])
+        if len(self.ids) != self.vectors.shape[0]:
+            raise ValueError(f"Local index is inconsistent: {len(self.ids)} points, {self.vectors.shape[0]} vectors")
+
+        meta_path = self.path / "meta.json"
+        self.meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
+        self.rows = {point_id: row for row, point_id in enumerate(self.ids)}
+        self.lats = np.array([p.get('lat') if p.get('lat') is not None else np.nan for p in self.payloads], dtype=np.float64)
+        self.lngs = np.array([p.get('lng') if p.get('lng') is not None else np.nan for p in self.payloads], dtype=np.float64)
+        self.types = np.array([p.get('type') for p in self.payloads], dtype=object)
+        self.cities = np.array([p.get('city') for p in self.payloads], dtype=object)
+        self.ratings = np.array([p.get('rating') or 0.0 for p in self.payloads], dtype=np.float64)
+        self.load_seconds = time.perf_counter() - started
+
+    def _location(self, row: int, score: float) -> dict:
+        payload = self.payloads[row]
+        return {
+            'id': self.ids[row], 'point_id': self.ids[row], 'score': score,
+            **{field: payload[field] for field in LOCATION_FIELDS if field in payload}
+        }
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        return query / norm if norm > 0 else query
+
+    def _rows(self, filters: Optional[SearchFilters]) -> np.ndarray:
+        """Rows matching the filters, with the same semantics as the Qdrant filter"""
+        if filters is None:
+            return np.arange(len(self.ids))
+
+        mask = np.ones(len(self.ids), dtype=bool)
+        if filters.center:
+            # Points without coordinates never match a geo radius
+            mask &= haversine_many(filters.center[0], filters.center[1], self.lats, self.lngs) <= filters.radius_km
+        if filters.type is not None:
+            mask &= self.types == filters.type
+        if filters.city is not None:
+            mask &= self.cities == filters.city
+        if filters.min_rating is not None:
+            mask &= self.ratings >= filters.min_rating
+        return np.flatnonzero(mask)
+
+    def _top(self, scores: np.ndarray, limit: int, filters: Optional[SearchFilters] = None) -> List[dict]:
+        """Best `limit` rows of a full score column among rows matching the filters"""
+        rows = self._rows(filters)
+        if len(rows) == 0:
+            return []
+
+        if len(rows) > limit:
+            rows = rows[np.argpartition(-scores[rows], limit)[:limit]]
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        return [self._location(int(row), float(scores[row])) for row in rows]
+
+    def search_sync(self, vector, limit, filters=None) -> List[dict]:
+        return self._top(self.vectors @ self._normalize(vector), limit, filters)
+
+    async def search(self, vector, limit, filters=None):
+        # A few ms for tens of thousands of 384-dim vectors; not worth a thread hop
+        return self.search_sync(vector, limit, filters)
+
+    async def search_batch(self, searches):
+        # One matrix-matrix product scores every query against every point
+        queries = np.stack([self._normalize(vector) for vector, _, _ in searches])
+        scores = np.asarray(self.vectors @ queries.T)
+        return [
+            self._top(scores[:, i], limit, filters)
+            for i, (_, limit, filters) in enumerate(searches)
+        ]
+
+    async def retrieve(self, point_ids):
+        return [self._location(self.rows[point_id], 0.0) for point_id in point_ids if point_id in self.rows]
+
+    async def documents(self, fields):
+        return [
+            {'point_id': point_id, **{field: payload.get(field) for field in fields}}
+            for point_id, payload in zip(self.ids, self.payloads)
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "path": str(self.path),
+            "points": len(self.ids),
+            "dimension": int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0,
+            "exported_at": self.meta.get("exported_at"),
+            "load_seconds": round(self.load_seconds, 3),
+        }
+
+def create_search_backend(backend: str = SEARCH_BACKEND) -> SearchBackend:
+    """Build the backend selected with SEARCH_BACKEND"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown SEARCH_BACKEND '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    if backend == "local":
+        return LocalBackend(LOCAL_INDEX_PATH)
+
+    return QdrantBackend(
+        url=os.getenv("QDRANT_API_URL"),
+        api_key=os.getenv("QDRANT_API_KEY"),
+    )
@@ -0,0 +1,59 @@
+"""
+Embedding model backends
+PyTorch (default), ONNX Runtime, or dynamic-int8-quantized ONNX
+Shared by the API and db/import_to_qdrant.py so query and site vectors stay compatible
+"""
+import os
+from typing import List, Optional
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"  # Supports Vietnamese
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Local directory with an exported model (see db/export_embedding_model.py); defaults to the hub model
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH") or MODEL_NAME
+# Instruction set the int8 model was quantized for: avx2, avx512, avx512_vnni or arm64
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "avx2")
+
+# Sentences used to check that a converted backend still agrees with the PyTorch model
+PARITY_SENTENCES = [
+    "cafe yên tĩnh Hà Nội",
+    "coworking quận 1",
+    "quán cà phê có wifi mạnh để làm việc",
+    "nhà hàng chay gần Hồ Gươm",
+    "Tên: Highlands Coffee | Loại: Cafe | Thành phố: Hồ Chí Minh | Địa chỉ: 135 Nguyễn Huệ",
+    "Tên: Cộng Cà Phê | Loại: Cafe | Thương hiệu: Cộng | Phường: Hàng Bạc",
+    "coworking space Hanoi",
+    "quiet place to study near the university",
+]
+
+def onnx_file_name(backend: str, quantization: str = EMBEDDING_QUANTIZATION) -> str:
+    """ONNX file inside the model directory for a backend"""
+    if backend == "onnx-int8":
+        return f"onnx/model_qint8_{quantization}.onnx"
+    return "onnx/model.onnx"
+
+def load_embedding_model(backend: str = EMBEDDING_BACKEND, model_path: str = EMBEDDING_MODEL_PATH,
+                         quantization: str = EMBEDDING_QUANTIZATION) -> SentenceTransformer:
+    """Load the embedding model with the selected backend"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    if backend == "torch":
+        return SentenceTransformer(model_path)
+
+    return SentenceTransformer(
+        model_path,
+        backend="onnx",
+        model_kwargs={"file_name": onnx_file_name(backend, quantization)},
+    )
+
+def cosine_agreement(reference: SentenceTransformer, candidate: SentenceTransformer, sentences: Optional[List[str]] = None) -> np.ndarray:
+    """Per-sentence cosine similarity between two models' embeddings"""
+    sentences = sentences or PARITY_SENTENCES
+    a = reference.encode(sentences, normalize_embeddings=True, show_progress_bar=False)
+    b = candidate.encode(sentences, normalize_embeddings=True, show_progress_bar=False)
+    return np.sum(np.asarray(a, dtype=np.float32) * np.asarray(b, dtype=np.float32), axis=1)
@@ -0,0 +1,212 @@
+"""
+Query embedding service
+Wraps the sentence-transformers model with an in-process LRU+TTL cache
+and a micro-batcher that merges concurrent encode requests into one forward pass
+"""
+import asyncio
+import os
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from services.cache import LRUTTLCache
+from services.embedding_backend import load_embedding_model
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))  # seconds
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "3"))
+
+# Backend (torch / onnx / onnx-int8) is selected with EMBEDDING_BACKEND
+embedding_model = load_embedding_model()
+
+# normalized query text -> read-only float32 vector
+embedding_cache = LRUTTLCache(maxsize=EMBEDDING_CACHE_SIZE, ttl=EMBEDDING_CACHE_TTL)
+
+_whitespace_re = re.compile(r"\s+")
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a query (NFC, collapsed spaces): the cache key and the text encoded
+    Case is kept because the model is case-sensitive
+    """
+    query = unicodedata.normalize("NFC", query)
+    return _whitespace_re.sub(" ", query).strip()
+
+def _to_compact(vector) -> np.ndarray:
+    """Store vectors as contiguous read-only float32 arrays"""
+    vector = np.ascontiguousarray(vector, dtype=np.float32)
+    vector.setflags(write=False)
+    return vector
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent encode requests for up to `max_wait_ms` (or until
+    `max_batch_size` texts are queued) and runs them as one batched `encode`
+    on a dedicated worker thread, resolving each caller's future with its row
+    """
+
+    def __init__(self, model: SentenceTransformer, max_batch_size: int = 32, max_wait_ms: float = 3):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        """Start the batching worker (call from the app lifespan)"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and fail any request still waiting"""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._queue:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("Embedding batcher stopped"))
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Queue one text and wait for its embedding"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self, batch: list) -> list:
+        """Wait for the first request, then gather more into `batch` until it is full or the window closes"""
+        loop = asyncio.get_running_loop()
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = []
+                await self._collect(batch)
+                # Skip callers that gave up (e.g. client disconnected)
+                batch = [(text, future) for text, future in batch if not future.done()]
+                if not batch:
+                    continue
+
+                texts = [text for text, _ in batch]
+                try:
+                    vectors = await loop.run_in_executor(
+                        self._executor,
+                        lambda: self.model.encode(texts, batch_size=len(texts), show_progress_bar=False)
+                    )
+                except Exception as e:
+                    self.errors += 1
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+
+                self.batches += 1
+                self.items += len(batch)
+                for (_, future), vector in zip(batch, vectors):
+                    if not future.done():
+                        future.set_result(vector)
+        except asyncio.CancelledError:
+            # Requests already taken off the queue are not failed by stop(); fail them here
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Embedding batcher stopped"))
+            raise
+
+    def stats(self) -> dict:
+        """Batch counters; fill ratio is the average batch size over `max_batch_size`"""
+        avg_batch_size = self.items / self.batches if self.batches else 0.0
+        return {
+            "running": self.running,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "avg_batch_size": round(avg_batch_size, 2),
+            "fill_ratio": round(avg_batch_size / self.max_batch_size, 4),
+        }
+
+embedding_batcher = EmbeddingBatcher(
+    embedding_model,
+    max_batch_size=EMBEDDING_BATCH_SIZE,
+    max_wait_ms=EMBEDDING_BATCH_WAIT_MS,
+)
+
+async def _encode_uncached(texts: List[str]) -> List[np.ndarray]:
+    """Encode through the batcher when it runs (API), directly in a thread otherwise"""
+    if embedding_batcher.running:
+        return await asyncio.gather(*(embedding_batcher.encode(text) for text in texts))
+    vectors = await asyncio.to_thread(embedding_model.encode, texts, show_progress_bar=False)
+    return list(vectors)
+
+async def encode_query(query: str) -> np.ndarray:
+    """Embed a search query, serving repeated queries from the cache"""
+    key = normalize_query(query)
+    vector = embedding_cache.get(key)
+    if vector is None:
+        vector = _to_compact((await _encode_uncached([key]))[0])
+        embedding_cache.set(key, vector)
+    return vector
+
+async def encode_queries(queries: List[str]) -> List[np.ndarray]:
+    """Embed many queries; cache misses are encoded together in one batch"""
+    keys = [normalize_query(query) for query in queries]
+    vectors = {}
+    missing = []
+    for key in keys:
+        if key in vectors or key in missing:
+            continue
+        vector = embedding_cache.get(key)
+        if vector is None:
+            missing.append(key)
+        else:
+            vectors[key] = vector
+
+    if missing:
+        encoded = await _encode_uncached(missing)
+        for key, vector in zip(missing, encoded):
+            vectors[key] = _to_compact(vector)
+            embedding_cache.set(key, vectors[key])
+
+    return [vectors[key] for key in keys]
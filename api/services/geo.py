@@ -0,0 +1,84 @@
+"""
+Geo distance utilities
+Vectorized with NumPy so distances to many candidates are computed in one shot
+"""
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+def haversine_many(lat: float, lng: float, lats, lngs) -> np.ndarray:
+    """
+    Haversine distance (km) from one point to arrays of points
+    Missing coordinates (NaN) yield NaN distances
+    """
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lngs = np.radians(np.asarray(lngs, dtype=np.float64))
+    lat_rad = math.radians(lat)
+
+    a = (np.sin((lats - lat_rad) / 2) ** 2
+         + math.cos(lat_rad) * np.cos(lats) * np.sin((lngs - math.radians(lng)) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def coordinates_array(locations: list) -> tuple:
+    """(lats, lngs) float arrays for a list of location dicts, NaN where unknown"""
+    lats = np.array([loc.get('lat') if loc.get('lat') is not None else np.nan for loc in locations], dtype=np.float64)
+    lngs = np.array([loc.get('lng') if loc.get('lng') is not None else np.nan for loc in locations], dtype=np.float64)
+    return lats, lngs
+
+def format_distance(distance_km) -> str:
+    """Human readable distance, empty when unknown"""
+    if distance_km is None or math.isnan(distance_km):
+        return ""
+    if distance_km < 1:
+        return f"{int(round(distance_km * 1000))} m"
+    return f"{round(distance_km, 1)} km"
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash_encode(lat: float, lng: float, precision: int = 6) -> str:
+    """Standard base32 geohash (precision 6 is a ~1.2 x 0.6 km cell)"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch = (ch << 1) | 1
+            rng[0] = mid
+        else:
+            ch <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+def geohash_bounds(geohash: str) -> tuple:
+    """((lat_min, lat_max), (lng_min, lng_max)) of a geohash cell"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for c in geohash:
+        value = _GEOHASH_BASE32.index(c)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return tuple(lat_range), tuple(lng_range)
+
+def geohash_center(geohash: str) -> tuple:
+    """(lat, lng) of the centre of a geohash cell"""
+    (lat_min, lat_max), (lng_min, lng_max) = geohash_bounds(geohash)
+    return (lat_min + lat_max) / 2, (lng_min + lng_max) / 2
+
+def geohash_half_diagonal_km(geohash: str) -> float:
+    """Farthest any point of the cell can be from its centre (km), ~0.65 km at precision 6"""
+    (lat_min, lat_max), (lng_min, lng_max) = geohash_bounds(geohash)
+    lat, lng = geohash_center(geohash)
+    return float(haversine_many(lat, lng, [lat_min, lat_max], [lng_min, lng_min]).max())
@@ -0,0 +1,130 @@
+"""
+In-process BM25 lexical index over site search texts
+Vietnamese diacritics are folded ("Cộng Cà Phê" matches "cong ca phe") so exact
+brand and street names are found even when typed without accents
+"""
+import math
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from services.geo import haversine_many
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_token_re = re.compile(r"[a-z0-9]+")
+
+def fold_diacritics(text: str) -> str:
+    """Lowercase and strip Vietnamese diacritics (đ -> d)"""
+    text = unicodedata.normalize("NFD", text.casefold()).replace("đ", "d")
+    return "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+
+def tokenize(text: str) -> List[str]:
+    return _token_re.findall(fold_diacritics(text))
+
+class _Snapshot:
+    """Immutable postings with precomputed BM25 term weights"""
+
+    def __init__(self, ids: List[str], texts: List[str], lats, lngs, attributes: Optional[List[dict]] = None):
+        self.ids = ids
+        self.attributes = attributes
+        self.lats = np.array([np.nan if lat is None else lat for lat in lats], dtype=np.float32)
+        self.lngs = np.array([np.nan if lng is None else lng for lng in lngs], dtype=np.float32)
+
+        doc_terms = [Counter(tokenize(text or "")) for text in texts]
+        doc_lengths = np.array([sum(terms.values()) for terms in doc_terms], dtype=np.float32)
+        avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+        docs_by_term = defaultdict(list)
+        tfs_by_term = defaultdict(list)
+        for doc, terms in enumerate(doc_terms):
+            for term, tf in terms.items():
+                docs_by_term[term].append(doc)
+                tfs_by_term[term].append(tf)
+
+        n_docs = len(ids)
+        self.postings = {}
+        for term, docs in docs_by_term.items():
+            docs = np.array(docs, dtype=np.int32)
+            tfs = np.array(tfs_by_term[term], dtype=np.float32)
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[docs] / (avg_length or 1.0))
+            weights = (idf * tfs * (BM25_K1 + 1) / (tfs + norm)).astype(np.float32)
+            self.postings[term] = (docs, weights)
+
+class LexicalIndex:
+    """BM25 search returning (point id, score) pairs, best first"""
+
+    def __init__(self):
+        self._snapshot: Optional[_Snapshot] = None
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def build(self, ids: List[str], texts: List[str], lats: list, lngs: list, attributes: Optional[List[dict]] = None):
+        """
+        Rebuild from parallel lists and swap in atomically
+        attributes: optional per-document dicts that `search(where=...)` can filter on
+        """
+        started = time.perf_counter()
+        snapshot = _Snapshot(ids, texts, lats, lngs, attributes)
+        self._snapshot = snapshot
+        self.build_seconds = time.perf_counter() - started
+        self.built_at = time.time()
+
+    def search(self, query: str, limit: int, near: Optional[Tuple[float, float, float]] = None,
+               where: Optional[Callable[[dict], bool]] = None) -> List[Tuple[str, float]]:
+        """
+        Top `limit` documents by BM25 score
+        near: optional (lat, lng, radius_km); documents outside the radius are dropped
+        where: optional predicate on a document's attributes
+        """
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot.ids:
+            return []
+
+        scores = np.zeros(len(snapshot.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = snapshot.postings.get(term)
+            if posting is not None:
+                docs, weights = posting
+                scores[docs] += weights
+
+        matched = np.flatnonzero(scores > 0)
+        if near is not None and len(matched):
+            lat, lng, radius_km = near
+            distances = haversine_many(lat, lng, snapshot.lats[matched], snapshot.lngs[matched])
+            matched = matched[distances <= radius_km]
+        if where is not None and snapshot.attributes is not None and len(matched):
+            matched = matched[np.array([where(snapshot.attributes[doc]) for doc in matched], dtype=bool)]
+        if len(matched) == 0:
+            return []
+
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit)[:limit]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(snapshot.ids[doc], float(scores[doc])) for doc in matched]
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "ready": snapshot is not None,
+            "documents": len(snapshot.ids) if snapshot else 0,
+            "terms": len(snapshot.postings) if snapshot else 0,
+            "built_at": self.built_at,
+            "build_seconds": round(self.build_seconds, 3) if self.build_seconds is not None else None,
+        }
+
+def reciprocal_rank_fusion(ranked_lists: List[List[str]], weights: List[float], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(id) = sum(weight / (k + rank)), rank starting at 1"""
+    fused = defaultdict(float)
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, doc_id in enumerate(ranked, start=1):
+            fused[doc_id] += weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -3,98 +3,280 @@ Search and location services
 """
 import os
 from typing import List, Optional
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
-import math
+import asyncio
+import numpy as np
+from models.schemas import LocationResult
+from dataclasses import replace
+from services.backends import create_search_backend, SearchFilters
+from services.cache import LRUTTLCache, SingleFlight
+from services.embeddings import encode_query, encode_queries, normalize_query
+from services.geo import haversine_many, coordinates_array, format_distance, geohash_encode, geohash_center, geohash_half_diagonal_km
+from services.lexical import LexicalIndex, reciprocal_rank_fusion
+from services.tasks import run_periodically
 
-# Initialize clients
-qdrant_client = QdrantClient(
-    url=os.getenv("QDRANT_API_URL"),
-    api_key=os.getenv("QDRANT_API_KEY"),
-)
-embedding_model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+# Vector search backend (hosted Qdrant or local snapshot), selected with SEARCH_BACKEND
+search_backend = create_search_backend()
 
-COLLECTION_NAME = "cospa_sites"
+SEARCH_RADIUS_KM = 30  # Only return locations within this distance of the user
+SEARCH_PAGE_DEPTH = int(os.getenv("SEARCH_PAGE_DEPTH", "100"))  # results reachable through /api/search paging
+CLUSTER_RADIUS_KM = 20  # Keep results within this distance of the top hit
 
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two points using Haversine formula (in km)"""
-    R = 6371  # Earth radius in kilometers
+# Hybrid retrieval: BM25 over `search_text` fused with dense results (reciprocal-rank fusion)
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "0.3"))  # dense list gets 1 - weight
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # candidates taken from each list
+RRF_K = int(os.getenv("RRF_K", "60"))
+LEXICAL_INDEX_REFRESH_SECONDS = float(os.getenv("LEXICAL_INDEX_REFRESH_SECONDS", "600"))
+
+lexical_index = LexicalIndex()
+
+# Result cache: (normalized query, limit, filters around the geohash cell of user_location) -> candidates
+# Retrieval runs around the cell centre, with the radius widened by the cell's half-diagonal,
+# so every user in a cell shares one entry; the exact radius, distances and distance sorting
+# are then applied from the user's own location
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "5000"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))  # seconds
+SEARCH_CACHE_GEOHASH_PRECISION = int(os.getenv("SEARCH_CACHE_GEOHASH_PRECISION", "6"))  # ~1.2 x 0.6 km
+
+search_cache = LRUTTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+search_flight = SingleFlight()  # one in-flight backend call per cache key
+_search_cache_generation = 0
+
+def invalidate_search_cache():
+    """Drop cached results, e.g. after the collection was re-imported
+    In-flight searches started before this call will not be cached"""
+    global _search_cache_generation
+    _search_cache_generation += 1
+    search_cache.clear()
+
+def search_cache_stats() -> dict:
+    return {**search_cache.stats(), **search_flight.stats(), "generation": _search_cache_generation}
+
+async def search_locations(query: str, limit: int = 5, user_location: Optional[dict] = None, sort_by: str = "relevance",
+                           filters: Optional[SearchFilters] = None) -> List[dict]:
+    """
+    Search for locations using vector search (Qdrant or the local index, see services/backends.py)
+    Filter by user location if provided (geo radius is applied inside the backend,
+    so the top-k is taken among nearby points only)
+    sort_by: "relevance" (vector score) or "distance" (nearest first, needs user_location)
+    filters: optional type / city / min_rating / radius_km (center comes from user_location)
+    Results are cached per query, filters and location cell; concurrent identical searches share one call
+    """
+    candidates = await _cached_candidates(query, limit, user_location, filters)
+    return rank_for_user(candidates, limit, user_location, sort_by, _radius_km(filters))
+
+async def search_page(query: str, offset: int, limit: int, user_location: Optional[dict] = None,
+                      sort_by: str = "relevance", filters: Optional[SearchFilters] = None) -> tuple:
+    """
+    One page of a ranked list of up to SEARCH_PAGE_DEPTH results: (locations, total)
+    The list is retrieved once and cached, so every page slices the same stable order
+    (distance sort breaks ties by relevance). No clustering around the top hit
+    """
+    candidates = await _cached_candidates(query, SEARCH_PAGE_DEPTH, user_location, filters)
+    locations = [dict(loc) for loc in candidates]
+    
+    user_lat = user_location.get('lat') if user_location else None
+    user_lng = user_location.get('lng') if user_location else None
+    if user_lat and user_lng and locations:
+        _set_distances(locations, user_lat, user_lng)
+        locations = _within_radius(locations, _radius_km(filters))
+        if sort_by == "distance":
+            locations.sort(key=lambda loc: (loc['distance_km'] is None, loc['distance_km'] or 0.0))
+    
+    return locations[offset:offset + limit], len(locations)
+
+async def search_locations_batch(searches: List[dict]) -> List[List[dict]]:
+    """
+    Run many searches at once: {'query', 'limit', 'user_location', 'sort_by'} each
+    Cache misses are embedded together and sent to the backend as one batch search
+    Returns one result list per search, in order, same shape as search_locations
+    """
+    keys = [_cache_key(search['query'], search['limit'], search.get('user_location')) for search in searches]
+    candidates = [search_cache.get(key) for key, _ in keys]
     
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
+    # Distinct cache misses
+    misses = {}
+    for search, (key, filters), cached in zip(searches, keys, candidates):
+        if cached is None and key not in misses:
+            misses[key] = (search['query'], search['limit'], filters)
     
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
+    if misses:
+        retrieved = await retrieve_candidates_batch(list(misses.values()))
+        fresh = {}
+        for key, locations in zip(misses, retrieved):
+            fresh[key] = tuple(locations)
+            if key[0] == _search_cache_generation:
+                search_cache.set(key, fresh[key])
+        candidates = [cached if cached is not None else fresh[key] for (key, _), cached in zip(keys, candidates)]
     
-    return R * c
+    return [
+        rank_for_user(found, search['limit'], search.get('user_location'), search.get('sort_by', "relevance"))
+        for search, found in zip(searches, candidates)
+    ]
 
-def search_locations(query: str, limit: int = 5, user_location: Optional[dict] = None) -> List[dict]:
+def _radius_km(filters: Optional[SearchFilters]) -> float:
+    """Radius the user asked for (SEARCH_RADIUS_KM by default)"""
+    return (filters.radius_km if filters else None) or SEARCH_RADIUS_KM
+
+def _cache_key(query: str, limit: int, user_location: Optional[dict], filters: Optional[SearchFilters] = None) -> tuple:
     """
-    Search for locations using Qdrant vector search
-    Filter by user location if provided
+    (cache key, filters for the backend) with the geo radius centred on the user's geohash cell
+    The radius is widened by the cell's half-diagonal so it covers the user's own circle;
+    callers drop what lies beyond the requested radius (_within_radius)
     """
-    # Generate embedding for query
-    query_vector = embedding_model.encode(query).tolist()
-    
-    # Search in Qdrant
-    search_results = qdrant_client.search(
-        collection_name=COLLECTION_NAME,
-        query_vector=query_vector,
-        limit=limit * 3 if user_location else limit  # Get more results for filtering
-    )
+    filters = filters or SearchFilters()
+    user_lat = user_location.get('lat') if user_location else None
+    user_lng = user_location.get('lng') if user_location else None
+    if user_lat and user_lng:
+        cell = geohash_encode(user_lat, user_lng, SEARCH_CACHE_GEOHASH_PRECISION)
+        filters = replace(filters, center=geohash_center(cell),
+                          radius_km=_radius_km(filters) + geohash_half_diagonal_km(cell))
+    else:
+        filters = replace(filters, center=None, radius_km=None)
+    return (_search_cache_generation, normalize_query(query), limit, filters), filters
+
+async def _cached_candidates(query: str, limit: int, user_location: Optional[dict], filters: Optional[SearchFilters]) -> tuple:
+    key, filters = _cache_key(query, limit, user_location, filters)
+    candidates = search_cache.get(key)
+    if candidates is None:
+        candidates = await search_flight.do(key, lambda: _retrieve_and_cache(key, query, limit, filters))
+    return candidates
+
+def _set_distances(locations: List[dict], user_lat: float, user_lng: float) -> tuple:
+    """Set `distance_km` on each location; returns the latitude/longitude arrays"""
+    lats, lngs = coordinates_array(locations)
+    distances = haversine_many(user_lat, user_lng, lats, lngs)
+    for loc, distance in zip(locations, distances):
+        loc['distance_km'] = None if np.isnan(distance) else float(distance)
+    return lats, lngs
+
+def _within_radius(locations: List[dict], radius_km: float) -> List[dict]:
+    """Locations whose `distance_km` is within `radius_km` (unknown distances are kept)"""
+    return [loc for loc in locations if loc['distance_km'] is None or loc['distance_km'] <= radius_km]
+
+def rank_for_user(candidates, limit: int, user_location: Optional[dict] = None, sort_by: str = "relevance",
+                  radius_km: float = SEARCH_RADIUS_KM) -> List[dict]:
+    """
+    Add `distance_km` from the exact user location, drop results beyond `radius_km` and
+    outliers far from the top hit, optionally sort by distance
+    """
+    user_lat = user_location.get('lat') if user_location else None
+    user_lng = user_location.get('lng') if user_location else None
+    has_location = bool(user_lat and user_lng)
     
-    locations = []
-    for result in search_results:
-        loc = {
-            'id': str(result.id),
-            'score': result.score,
-            **result.payload
-        }
-        locations.append(loc)
-    
-    # Filter by user location if provided
-    if user_location and locations:
-        user_lat = user_location.get('lat')
-        user_lng = user_location.get('lng')
+    # Cached dicts are shared; annotate copies
+    locations = [dict(loc) for loc in candidates]
+    
+    if has_location and locations:
+        _set_distances(locations, user_lat, user_lng)
+        locations = _within_radius(locations, radius_km)
+        lats, lngs = coordinates_array(locations)
         
-        if user_lat and user_lng:
-            # Calculate distances and filter
-            filtered_locations = []
-            for loc in locations:
-                if loc.get('lat') and loc.get('lng'):
-                    distance = haversine_distance(user_lat, user_lng, loc['lat'], loc['lng'])
-                    
-                    # Only include locations within 30km
-                    if distance <= 30:
-                        loc['distance_km'] = distance
-                        filtered_locations.append(loc)
-            
-            # Check if results are clustered (within 20km of each other)
-            if len(filtered_locations) > 1:
-                clustered = []
-                base_loc = filtered_locations[0]
-                clustered.append(base_loc)
-                
-                for loc in filtered_locations[1:]:
-                    dist_to_base = haversine_distance(
-                        base_loc['lat'], base_loc['lng'],
-                        loc['lat'], loc['lng']
-                    )
-                    if dist_to_base <= 20:
-                        clustered.append(loc)
-                
-                locations = clustered[:limit]
-            else:
-                locations = filtered_locations[:limit]
-        else:
-            locations = locations[:limit]
-    else:
-        locations = locations[:limit]
+        # Check if results are clustered (within 20km of the top hit)
+        keep = np.ones(len(locations), dtype=bool)
+        if len(locations) > 1 and not np.isnan(lats[0]):
+            keep[1:] = haversine_many(lats[0], lngs[0], lats[1:], lngs[1:]) <= CLUSTER_RADIUS_KM
+        locations = [loc for loc, kept in zip(locations, keep) if kept]
+        
+        if sort_by == "distance":
+            locations.sort(key=lambda loc: (loc['distance_km'] is None, loc['distance_km'] or 0.0))
+    
+    return locations[:limit]
+
+async def _retrieve_and_cache(key: tuple, query: str, limit: int, filters: SearchFilters) -> tuple:
+    candidates = tuple(await retrieve_candidates(query, limit, filters))
+    if key[0] == _search_cache_generation:
+        search_cache.set(key, candidates)
+    return candidates
+
+async def retrieve_candidates(query: str, limit: int, filters: Optional[SearchFilters] = None) -> List[dict]:
+    """Dense (+ lexical) retrieval among points matching `filters`, best first"""
+    # Generate embedding for query (cached for repeated queries)
+    query_vector = await encode_query(query)
+    
+    hybrid = HYBRID_SEARCH_ENABLED and lexical_index.ready
+    
+    locations = await search_backend.search(
+        query_vector,
+        max(limit, HYBRID_CANDIDATES) if hybrid else limit,
+        filters
+    )
     
+    if hybrid:
+        locations = await _fuse_lexical(query, locations, limit, filters)
+    
+    return locations[:limit]
+
+async def retrieve_candidates_batch(searches: List[tuple]) -> List[List[dict]]:
+    """retrieve_candidates for many (query, limit, filters) at once: one encode, one backend batch search"""
+    query_vectors = await encode_queries([query for query, _, _ in searches])
+    
+    hybrid = HYBRID_SEARCH_ENABLED and lexical_index.ready
+    
+    results = await search_backend.search_batch([
+        (vector, max(limit, HYBRID_CANDIDATES) if hybrid else limit, filters)
+        for vector, (_, limit, filters) in zip(query_vectors, searches)
+    ])
+    
+    if hybrid:
+        results = await asyncio.gather(*(
+            _fuse_lexical(query, locations, limit, filters)
+            for locations, (query, limit, filters) in zip(results, searches)
+        ))
+    
+    return [locations[:limit] for locations, (_, limit, _) in zip(results, searches)]
+
+async def _fuse_lexical(query: str, locations: List[dict], limit: int, filters: Optional[SearchFilters]) -> List[dict]:
+    filtered = filters is not None and (filters.type is not None or filters.city is not None or filters.min_rating is not None)
+    lexical_hits = lexical_index.search(
+        query,
+        max(limit, HYBRID_CANDIDATES),
+        near=(filters.center[0], filters.center[1], filters.radius_km) if filters and filters.center else None,
+        where=filters.matches if filtered else None
+    )
+    return await fuse_results(locations, lexical_hits, limit)
+
+async def fuse_results(dense_locations: List[dict], lexical_hits: List[tuple], limit: int) -> List[dict]:
+    """
+    Reciprocal-rank fusion of dense hits and (point id, bm25) lexical hits
+    Lexical-only hits are fetched from the backend by point id; `score` stays the dense score (0 if none)
+    """
+    dense_by_id = {loc['point_id']: loc for loc in dense_locations}
+    fused = reciprocal_rank_fusion(
+        [[loc['point_id'] for loc in dense_locations], [point_id for point_id, _ in lexical_hits]],
+        [1 - HYBRID_LEXICAL_WEIGHT, HYBRID_LEXICAL_WEIGHT],
+        k=RRF_K
+    )[:limit]
+    
+    missing = [point_id for point_id, _ in fused if point_id not in dense_by_id]
+    fetched = {}
+    if missing:
+        fetched = {loc['point_id']: loc for loc in await search_backend.retrieve(missing)}
+    
+    locations = []
+    for point_id, fused_score in fused:
+        loc = dense_by_id.get(point_id) or fetched.get(point_id)
+        if loc:
+            loc['fused_score'] = fused_score
+            locations.append(loc)
     return locations
 
+async def refresh_lexical_index():
+    """Rebuild the BM25 index from the search backend off the event loop"""
+    documents = await search_backend.documents(['search_text', 'lat', 'lng', 'type', 'city', 'rating'])
+    await asyncio.to_thread(
+        lexical_index.build,
+        [doc['point_id'] for doc in documents],
+        [doc.get('search_text') for doc in documents],
+        [doc.get('lat') for doc in documents],
+        [doc.get('lng') for doc in documents],
+        [{'type': doc.get('type'), 'city': doc.get('city'), 'rating': doc.get('rating')} for doc in documents]
+    )
+
+async def run_lexical_index_refresh(interval: float = LEXICAL_INDEX_REFRESH_SECONDS):
+    """Background task: build at startup, then refresh every `interval` seconds"""
+    await run_periodically(refresh_lexical_index, interval, "lexical index")
+
 def create_system_prompt(locations: List[dict], user_location: Optional[dict] = None) -> str:
     """Create system prompt with location context"""
     base_prompt = """Bạn là trợ lý AI chuyên về địa điểm ăn uống và không gian làm việc tại Việt Nam, đặc biệt phục vụ freelancer và sinh viên.
@@ -120,6 +302,8 @@ Nhiệm vụ của bạn:
             base_prompt += f"{idx}. **{loc['name']}**\n"
             base_prompt += f"   Loại: {loc.get('type', 'N/A')}\n"
             base_prompt += f"   Địa chỉ: {loc.get('address', 'N/A')}\n"
+            if loc.get('distance_km') is not None:
+                base_prompt += f"   Khoảng cách: {format_distance(loc['distance_km'])}\n"
             if loc.get('rating'):
                 base_prompt += f"   Rating: {loc['rating']}/5\n"
             if loc.get('brand'):
@@ -128,3 +312,36 @@ Nhiệm vụ của bạn:
                 base_prompt += f"   SĐT: {loc['phone_number']}\n"
     
     return base_prompt
+
+def format_locations(locations: List[dict]) -> List[LocationResult]:
+    """Format location dicts (search hits, nearby sites) as API results"""
+    location_results = []
+    for loc in locations:
+        # Generate mock amenities based on type
+        amenities = []
+        if loc['type'] in ['Cafe', 'cafe']:
+            amenities = ['wifi', 'coffee', 'seating']
+        elif loc['type'] in ['Coworking', 'coworking space']:
+            amenities = ['wifi', 'meeting rooms', 'quiet space']
+
+        location_results.append(LocationResult(
+            id=loc['id'],
+            name=loc['name'],
+            type=loc['type'],
+            brand=loc.get('brand'),
+            rating=loc.get('rating'),
+            review_count=loc.get('review_count'),
+            address=loc['address'],
+            distance=format_distance(loc.get('distance_km')),
+            lat=loc.get('lat'),
+            lng=loc.get('lng'),
+            phone_number=loc.get('phone_number'),
+            link_google=loc.get('link_google'),
+            link_web=loc.get('link_web'),
+            thumbnail_url=loc.get('thumbnail_url') or "https://cdn.xanhsm.com/2025/02/13cba011-cafe-sang-sai-gon-4.jpg",
+            amenities=amenities,
+            isSponsored=False,  # Can be enhanced with actual sponsored data
+            description=f"Great {loc['type'].lower()} in {loc['address'].split(',')[-1].strip() if ',' in loc['address'] else 'Vietnam'}"
+        ))
+
+    return location_results
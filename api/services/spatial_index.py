@@ -0,0 +1,169 @@
+"""
+In-process spatial index of active sites
+A uniform lat/lng grid over compact float32 arrays, built from the `sites` table
+at startup and rebuilt periodically in the background
+"""
+import asyncio
+import math
+import os
+import time
+from typing import List, Optional
+import numpy as np
+from psycopg_pool import AsyncConnectionPool
+from services.geo import haversine_many
+from services.tasks import run_periodically
+
+SPATIAL_INDEX_CELL_DEG = float(os.getenv("SPATIAL_INDEX_CELL_DEG", "0.01"))  # ~1.1 km cells
+SPATIAL_INDEX_REFRESH_SECONDS = float(os.getenv("SPATIAL_INDEX_REFRESH_SECONDS", "300"))
+
+KM_PER_DEG_LAT = 111.32
+_CELL_OFFSET = 1 << 20  # keeps cell coordinates positive when packed into one int64 key
+_MAX_QUERY_CELLS = 4096  # beyond this, scanning every point is cheaper than walking cells
+
+SITE_FIELDS = (
+    'id', 'name', 'type', 'brand', 'address', 'rating', 'review_count',
+    'phone_number', 'link_google', 'link_web', 'thumbnail_url',
+)
+
+SITES_QUERY = """
+    SELECT
+        id, name, type, brand, COALESCE(new_address, old_address), rating, review_count,
+        phone_number, link_google, link_web, thumbnail_url,
+        lat, lng
+    FROM sites
+    WHERE is_active = TRUE
+    AND lat IS NOT NULL AND lng IS NOT NULL
+"""
+
+def _cell_key(cy, cx):
+    return (cy + _CELL_OFFSET) * (2 * _CELL_OFFSET) + (cx + _CELL_OFFSET)
+
+class _Snapshot:
+    """Immutable index data; swapped as a whole on refresh"""
+
+    def __init__(self, rows: list, cell_deg: float):
+        self.cell_deg = cell_deg
+        lats = np.array([row[-2] for row in rows], dtype=np.float32)
+        lngs = np.array([row[-1] for row in rows], dtype=np.float32)
+
+        # Sort points by grid cell so every cell is one contiguous slice
+        keys = _cell_key(
+            np.floor(lats / cell_deg).astype(np.int64),
+            np.floor(lngs / cell_deg).astype(np.int64)
+        )
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        self.lats = lats[order]
+        self.lngs = lngs[order]
+        self.sites = [dict(zip(SITE_FIELDS, rows[i][:len(SITE_FIELDS)])) for i in order]
+        for site in self.sites:
+            site['id'] = str(site['id'])
+            site['name'] = site['name'] or ''
+            site['type'] = site['type'] or ''
+            site['address'] = site['address'] or ''
+            site['rating'] = float(site['rating']) if site['rating'] is not None else None
+
+        # Type filter works on small integer codes
+        type_names = [site['type'].casefold() for site in self.sites]
+        self.type_codes = {name: code for code, name in enumerate(sorted(set(type_names)))}
+        self.types = np.array([self.type_codes[name] for name in type_names], dtype=np.int32)
+
+        cell_keys, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+        self.cells = {int(key): (int(start), int(start + count)) for key, start, count in zip(cell_keys, starts, counts)}
+
+    def candidates(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        """Indices of points in the grid cells overlapping the radius bounding box"""
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlng = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        cy0, cy1 = math.floor((lat - dlat) / self.cell_deg), math.floor((lat + dlat) / self.cell_deg)
+        cx0, cx1 = math.floor((lng - dlng) / self.cell_deg), math.floor((lng + dlng) / self.cell_deg)
+
+        if (cy1 - cy0 + 1) * (cx1 - cx0 + 1) > _MAX_QUERY_CELLS:
+            return np.arange(len(self.sites))
+
+        slices = []
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                span = self.cells.get(_cell_key(cy, cx))
+                if span:
+                    slices.append(np.arange(*span))
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+class SpatialIndex:
+    """Radius queries over all active sites without touching Postgres or Qdrant"""
+
+    def __init__(self, cell_deg: float = SPATIAL_INDEX_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._snapshot: Optional[_Snapshot] = None
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def build(self, rows: list):
+        """Rebuild from (SITE_FIELDS..., lat, lng) rows and swap in atomically"""
+        started = time.perf_counter()
+        snapshot = _Snapshot(rows, self.cell_deg)
+        self._snapshot = snapshot
+        self.build_seconds = time.perf_counter() - started
+        self.built_at = time.time()
+
+    def nearby(self, lat: float, lng: float, radius_km: float, site_type: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """Sites within `radius_km`, nearest first, each with a `distance_km` key"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return []
+
+        idx = snapshot.candidates(lat, lng, radius_km)
+        if site_type is not None:
+            code = snapshot.type_codes.get(site_type.casefold())
+            if code is None:
+                return []
+            idx = idx[snapshot.types[idx] == code]
+        if len(idx) == 0:
+            return []
+
+        distances = haversine_many(lat, lng, snapshot.lats[idx], snapshot.lngs[idx])
+        within = distances <= radius_km
+        idx, distances = idx[within], distances[within]
+
+        if len(idx) > limit:
+            top = np.argpartition(distances, limit)[:limit]
+            idx, distances = idx[top], distances[top]
+        order = np.argsort(distances, kind="stable")
+
+        results = []
+        for i in order:
+            site = dict(snapshot.sites[idx[i]])
+            site['lat'] = float(snapshot.lats[idx[i]])
+            site['lng'] = float(snapshot.lngs[idx[i]])
+            site['distance_km'] = float(distances[i])
+            results.append(site)
+        return results
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "ready": snapshot is not None,
+            "sites": len(snapshot.sites) if snapshot else 0,
+            "cells": len(snapshot.cells) if snapshot else 0,
+            "cell_deg": self.cell_deg,
+            "built_at": self.built_at,
+            "build_seconds": round(self.build_seconds, 3) if self.build_seconds is not None else None,
+        }
+
+spatial_index = SpatialIndex()
+
+async def refresh_spatial_index(pool: AsyncConnectionPool):
+    """Load active sites from Postgres and rebuild the index off the event loop"""
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(SITES_QUERY)
+            rows = await cur.fetchall()
+    await asyncio.to_thread(spatial_index.build, rows)
+
+async def run_spatial_index_refresh(pool: AsyncConnectionPool, interval: float = SPATIAL_INDEX_REFRESH_SECONDS):
+    """Background task: build at startup, then refresh every `interval` seconds"""
+    await run_periodically(lambda: refresh_spatial_index(pool), interval, "spatial index")
@@ -0,0 +1,16 @@
+"""
+Background task helpers
+"""
+import asyncio
+from typing import Awaitable, Callable
+
+async def run_periodically(refresh: Callable[[], Awaitable[None]], interval: float, name: str):
+    """Run `refresh` now and then every `interval` seconds; errors are logged and retried"""
+    while True:
+        try:
+            await refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error refreshing {name}: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,90 @@
+"""
+Cache and single-flight tests
+Run from api/: python -m unittest discover tests
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+from services.cache import LRUTTLCache, SingleFlight
+
+
+class LRUTTLCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUTTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_expired_entries_are_misses(self):
+        cache = LRUTTLCache(maxsize=2, ttl=10)
+        with mock.patch('services.cache.time.monotonic', return_value=100.0):
+            cache.set('a', 1)
+        with mock.patch('services.cache.time.monotonic', return_value=111.0):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.expirations, 1)
+        self.assertEqual(len(cache), 0)
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_share_one_run(self):
+        flight = SingleFlight()
+        runs = 0
+        release = asyncio.Event()
+
+        async def fetch():
+            nonlocal runs
+            runs += 1
+            await release.wait()
+            return 'result'
+
+        callers = [asyncio.create_task(flight.do('key', fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        self.assertEqual(await asyncio.gather(*callers), ['result'] * 3)
+        self.assertEqual(runs, 1)
+        self.assertEqual(flight.stats(), {'inflight': 0, 'calls': 1, 'coalesced': 2})
+
+    async def test_error_reaches_every_caller_and_is_not_kept(self):
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def failing():
+            await release.wait()
+            raise TimeoutError("backend deadline")
+
+        callers = [asyncio.create_task(flight.do('key', failing)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        self.assertTrue(all(isinstance(result, TimeoutError) for result in results))
+
+        # The failed call is not cached: the next call runs again
+        async def ok():
+            return 'ok'
+        self.assertEqual(await flight.do('key', ok), 'ok')
+
+    async def test_cancelled_caller_does_not_cancel_the_others(self):
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return 'result'
+
+        first = asyncio.create_task(flight.do('key', fetch))
+        second = asyncio.create_task(flight.do('key', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        self.assertEqual(await second, 'result')
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+
+
+if __name__ == '__main__':
+    unittest.main()
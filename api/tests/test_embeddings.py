@@ -0,0 +1,89 @@
+"""
+Query embedding cache tests
+Run from api/: python -m unittest discover tests
+"""
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from services import embeddings
+
+
+class FakeModel:
+    """Case-sensitive like the real model: the vector depends on the exact text"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.array([[float(sum(map(ord, text)))] for text in texts], dtype=np.float32)
+
+
+class EncodeQueryTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        embeddings.embedding_cache.clear()
+        self.model = FakeModel()
+        patch = mock.patch.object(embeddings, 'embedding_model', self.model)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    async def test_encodes_the_cache_key(self):
+        await embeddings.encode_query("  Cộng   Cà Phê ")
+        await embeddings.encode_queries(["cafe  yên tĩnh"])
+        self.assertEqual(self.model.encoded, ["Cộng Cà Phê", "cafe yên tĩnh"])
+
+    async def test_case_variants_do_not_share_a_vector(self):
+        first = await embeddings.encode_query("highlands")
+        upper = await embeddings.encode_query("Highlands")
+        again = await embeddings.encode_query("highlands ")
+        self.assertFalse(np.array_equal(first, upper))
+        self.assertTrue(np.array_equal(first, again))
+        self.assertEqual(self.model.encoded, ["highlands", "Highlands"])
+
+
+class BlockingModel:
+    """encode() blocks until released, so the batcher can be stopped mid-batch"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def encode(self, texts, **kwargs):
+        self.started.set()
+        self.release.wait(5)
+        return np.zeros((len(texts), 1), dtype=np.float32)
+
+
+class EmbeddingBatcherStopTest(unittest.IsolatedAsyncioTestCase):
+    async def test_stop_fails_the_batch_being_encoded(self):
+        model = BlockingModel()
+        self.addCleanup(model.release.set)
+        batcher = embeddings.EmbeddingBatcher(model, max_batch_size=4, max_wait_ms=0)
+        await batcher.start()
+
+        request = asyncio.create_task(batcher.encode("cafe"))
+        await asyncio.to_thread(model.started.wait, 5)
+        await batcher.stop()
+
+        with self.assertRaises(RuntimeError):
+            await asyncio.wait_for(request, 1)
+
+    async def test_stop_fails_requests_being_collected(self):
+        batcher = embeddings.EmbeddingBatcher(BlockingModel(), max_batch_size=4, max_wait_ms=10000)
+        await batcher.start()
+
+        # Taken off the queue, waiting for the batch window to close
+        request = asyncio.create_task(batcher.encode("cafe"))
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+
+        with self.assertRaises(RuntimeError):
+            await asyncio.wait_for(request, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Hybrid search fusion tests
+Run from api/: python -m unittest discover tests
+"""
+import unittest
+from unittest import mock
+
+from services import search
+
+
+class FakeBackend:
+    def __init__(self, locations):
+        self.locations = locations
+        self.retrieved = []
+
+    async def retrieve(self, point_ids):
+        self.retrieved.extend(point_ids)
+        return [loc for loc in self.locations if loc['point_id'] in point_ids]
+
+
+class FuseResultsTest(unittest.IsolatedAsyncioTestCase):
+    async def test_site_in_both_lists_is_merged(self):
+        # Payloads carry the site UUID as 'id'; the lexical index returns point ids
+        dense = [
+            {'id': 'site-a', 'point_id': '1', 'score': 0.9, 'name': 'Cộng Cà Phê'},
+            {'id': 'site-b', 'point_id': '2', 'score': 0.8, 'name': 'Highlands Coffee'},
+        ]
+        lexical_hits = [('2', 7.5), ('3', 4.0)]
+        backend = FakeBackend([{'id': 'site-c', 'point_id': '3', 'score': 0.0, 'name': 'Phúc Long'}])
+
+        with mock.patch.object(search, 'search_backend', backend):
+            fused = await search.fuse_results(dense, lexical_hits, limit=10)
+
+        self.assertEqual([loc['id'] for loc in fused].count('site-b'), 1)
+        self.assertEqual(sorted(loc['id'] for loc in fused), ['site-a', 'site-b', 'site-c'])
+        # Ranked in both lists, so it outscores the dense-only top hit
+        self.assertEqual(fused[0]['id'], 'site-b')
+        # Only the lexical-only hit is fetched
+        self.assertEqual(backend.retrieved, ['3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Geo radius tests for cached search
+Run from api/: python -m unittest discover tests
+"""
+import unittest
+from unittest import mock
+
+from services import search
+from services.backends import SearchFilters
+from services.geo import haversine_many
+
+USER = {'lat': 21.0285, 'lng': 105.8542}
+
+
+class FakeBackend:
+    def __init__(self, locations):
+        self.locations = locations
+        self.filters = []
+
+    async def search(self, vector, limit, filters):
+        self.filters.append(filters)
+        return [dict(loc) for loc in self.locations][:limit]
+
+
+async def fake_encode_query(query):
+    return [0.0]
+
+
+class SearchRadiusTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        search.invalidate_search_cache()
+        # Sites due east of the user, 0.1 to 1.0 km away
+        self.backend = FakeBackend([
+            {'id': f'site-{i}', 'point_id': str(i), 'score': 1.0 - i / 100,
+             'lat': USER['lat'], 'lng': USER['lng'] + i * 0.00096}
+            for i in range(1, 11)
+        ])
+        patches = [
+            mock.patch.object(search, 'search_backend', self.backend),
+            mock.patch.object(search, 'encode_query', fake_encode_query),
+            mock.patch.object(search, 'HYBRID_SEARCH_ENABLED', False),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def test_backend_radius_covers_the_user_circle(self):
+        await search.search_page("cafe", 0, 10, USER, filters=SearchFilters(radius_km=0.5))
+        filters = self.backend.filters[0]
+        center_offset = haversine_many(USER['lat'], USER['lng'], [filters.center[0]], [filters.center[1]])[0]
+        self.assertGreaterEqual(filters.radius_km, 0.5 + center_offset)
+
+    async def test_results_beyond_radius_are_dropped(self):
+        locations, total = await search.search_page("cafe", 0, 10, USER, filters=SearchFilters(radius_km=0.5))
+        self.assertEqual(total, len(locations))
+        self.assertTrue(locations)
+        self.assertTrue(all(loc['distance_km'] <= 0.5 for loc in locations))
+        self.assertEqual(len(locations), 5)
+
+    async def test_search_locations_applies_radius(self):
+        locations = await search.search_locations("cafe", 10, USER, filters=SearchFilters(radius_km=0.5))
+        self.assertTrue(all(loc['distance_km'] <= 0.5 for loc in locations))
+
+
+if __name__ == '__main__':
+    unittest.main()
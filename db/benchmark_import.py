@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Import throughput benchmark
+Generates synthetic Vietnamese site CSVs in the layout import_all.py expects, loads them
+into a scratch PostgreSQL database, then streams them into a local Qdrant stand-in and
+runs an incremental sync. Prints (and optionally saves) rows/sec, peak RSS and
+per-stage timings as JSON
+
+Usage:
+    python benchmark_import.py --database cospa_bench --rows 100000
+    python benchmark_import.py --database cospa_bench --rows 1000000 --files 8 --jobs 8 \\
+        --duplicate-ratio 0.05 --malformed-ratio 0.01 --output bench.json
+
+The benchmark database is truncated; it must differ from POSTGRES_DB
+"""
+
+import argparse
+import csv
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+import hashlib
+import json
+import os
+from pathlib import Path
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Load environment variables
+load_dotenv()
+
+# Column layout of the crawled province CSVs (semicolon-delimited, UTF-8 with BOM)
+CSV_COLUMNS = [
+    'Tên địa điểm', 'Loại hình', 'Thương hiệu/Chuỗi', 'Địa chỉ cũ', 'Địa chỉ mới',
+    'Số nhà / Đường', 'Phường', 'Tỉnh/Thành phố', 'Khu vực', 'Link Google Maps',
+    'Website/MXH', 'Ảnh (URL)', 'Vĩ độ', 'Kinh độ', 'Ghi chú', 'SĐT', 'Điểm rating',
+    'Số review', 'Query nguồn', 'Place ID', 'Data ID', 'CID'
+]
+
+CITIES = {
+    'Hà Nội': (21.0285, 105.8542, ['Phường Hàng Bạc', 'Phường Tràng Tiền', 'Phường Dịch Vọng', 'Phường Láng Hạ']),
+    'Hồ Chí Minh': (10.7769, 106.7009, ['Phường Bến Nghé', 'Phường Bến Thành', 'Phường Thảo Điền', 'Phường 7']),
+    'Đà Nẵng': (16.0544, 108.2022, ['Phường Hải Châu 1', 'Phường Thạch Thang', 'Phường An Hải Bắc']),
+    'Hải Phòng': (20.8449, 106.6881, ['Phường Máy Tơ', 'Phường Lạch Tray']),
+    'Cần Thơ': (10.0452, 105.7469, ['Phường Tân An', 'Phường Cái Khế']),
+}
+TYPES = ['Cafe', 'Coworking Space', 'Nhà hàng', 'Thư viện', 'Quán trà sữa', 'Tiệm bánh', 'Quán ăn chay']
+BRANDS = ['Highlands Coffee', 'Cộng Cà Phê', 'The Coffee House', 'Phúc Long', 'Katinat', 'Trung Nguyên Legend']
+STREETS = ['Nguyễn Huệ', 'Lê Lợi', 'Trần Hưng Đạo', 'Hàng Bạc', 'Đinh Tiên Hoàng', 'Lý Thường Kiệt',
+           'Phan Đình Phùng', 'Võ Văn Tần', 'Nguyễn Thị Minh Khai', 'Bạch Đằng']
+NAME_WORDS = ['Góc', 'Nhà', 'Mộc', 'Sân', 'Gác', 'Chill', 'Yên', 'Phố', 'Hiên', 'Lá']
+NOTES = ['Wifi mạnh, nhiều ổ cắm', 'Yên tĩnh buổi sáng', 'Có chỗ đậu xe máy', 'Mở cửa 24/7',
+         'Không gian xanh\nphù hợp làm việc nhóm']
+
+# Share of malformed rows of each kind; none of them may abort the whole load
+MALFORMED_KINDS = ['truncated', 'bad_numbers', 'empty_name']
+# Truncated rows keep at least the columns up to Place ID, so they still upsert by place_id
+PLACE_ID_COLUMN = CSV_COLUMNS.index('Place ID')
+
+def format_decimal(value, digits):
+    """Vietnamese locale decimal comma, as in the crawled files"""
+    return f"{value:.{digits}f}".replace('.', ',')
+
+def generate_site(rng, index, place_id):
+    city = rng.choice(list(CITIES))
+    lat, lng, wards = CITIES[city]
+    brand = rng.choice(BRANDS) if rng.random() < 0.3 else ''
+    site_type = rng.choice(TYPES)
+    name = brand or f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {site_type}"
+    ward = rng.choice(wards)
+    street = f"{rng.randint(1, 300)} {rng.choice(STREETS)}"
+    return [
+        f"{name} {index}", site_type, brand,
+        f"{street}, {ward}, {city}", f"{street}, {ward}, {city}", street, ward, city,
+        rng.choice(['Trung tâm', 'Ngoại thành', '']),
+        f"https://maps.google.com/?cid={index}", rng.choice(['', f"https://facebook.com/site{index}"]),
+        f"https://lh5.googleusercontent.com/p/{place_id}=w400",
+        format_decimal(lat + rng.uniform(-0.08, 0.08), 7), format_decimal(lng + rng.uniform(-0.08, 0.08), 7),
+        rng.choice(NOTES) if rng.random() < 0.2 else '',
+        f"0{rng.randint(200000000, 999999999)}",
+        format_decimal(rng.uniform(3.0, 5.0), 1), str(rng.randint(0, 5000)),
+        f"{site_type} {city}", place_id, f"0x{rng.getrandbits(64):016x}", str(rng.getrandbits(63)),
+    ]
+
+def malform(rng, row):
+    kind = rng.choice(MALFORMED_KINDS)
+    if kind == 'truncated':
+        return row[:rng.randint(PLACE_ID_COLUMN + 1, len(row) - 1)]
+    if kind == 'bad_numbers':
+        row[12], row[13], row[16], row[17] = 'N/A', '', 'không rõ', '1.2k'
+    else:
+        row[0] = ''
+    return row
+
+def generate_csvs(output_dir, rows, files, duplicate_ratio, malformed_ratio, seed):
+    """Write `rows` synthetic sites spread over `files` CSVs; returns the file paths"""
+    rng = random.Random(seed)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # Duplicates repeat an earlier row exactly, so whichever copy wins the merge the
+    # stored site is the same and a re-import finds nothing to change
+    recent_rows = []
+    paths = []
+    per_file = -(-rows // files)
+    index = 0
+    for file_index in range(files):
+        path = output_dir / f"Tinh_{file_index + 1:02d}.csv"
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(['\ufeff' + CSV_COLUMNS[0]] + CSV_COLUMNS[1:])
+            for _ in range(min(per_file, rows - index)):
+                if recent_rows and rng.random() < duplicate_ratio:
+                    row = rng.choice(recent_rows)
+                else:
+                    place_id = f"ChIJ{hashlib.md5(f'{seed}:{index}'.encode()).hexdigest()[:23]}"
+                    row = generate_site(rng, index, place_id)
+                    if rng.random() < malformed_ratio:
+                        row = malform(rng, row)
+                    if len(recent_rows) < 10000:
+                        recent_rows.append(row)
+                    else:
+                        recent_rows[rng.randrange(10000)] = row
+                writer.writerow(row)
+                index += 1
+        paths.append(path)
+    return paths
+
+class HashEmbeddingModel:
+    """Deterministic stand-in for the sentence-transformers model (no model download)"""
+
+    def __init__(self, dimension=384):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+            vectors[i] = np.random.default_rng(seed).standard_normal(self.dimension, dtype=np.float32)
+        return vectors
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children (Linux reports KiB)"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(max(own, children) / scale, 1)
+
+def run_stage(results, name, fn):
+    print(f"\n--- {name} ---")
+    started = time.perf_counter()
+    stats = fn() or {}
+    seconds = time.perf_counter() - started
+    rows = stats.get('rows')
+    results['stages'][name] = {
+        **stats,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(rows / seconds, 1) if rows and seconds else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    print(f"✓ {name}: {seconds:.1f}s" + (f", {rows / seconds:,.0f} rows/s" if rows and seconds else ""))
+    return stats
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark the CSV import and Qdrant sync paths")
+    parser.add_argument('--database', required=True, help="Scratch PostgreSQL database (will be truncated)")
+    parser.add_argument('--rows', type=int, default=10000, help="Synthetic rows (e.g. 10000 to 10000000)")
+    parser.add_argument('--files', type=int, default=1, help="Number of CSV files to spread the rows over")
+    parser.add_argument('--duplicate-ratio', type=float, default=0.02, help="Share of rows reusing a place_id")
+    parser.add_argument('--malformed-ratio', type=float, default=0.005, help="Share of malformed rows")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--jobs', type=int, default=1, help="Parallel staging workers (import_all.py --jobs)")
+    parser.add_argument('--embeddings', choices=['hash', 'model'], default='hash',
+                        help="hash: deterministic stand-in vectors; model: the real embedding model")
+    parser.add_argument('--qdrant-url', default=None,
+                        help="Local Qdrant server; default is the in-process stand-in (single upsert worker)")
+    parser.add_argument('--sync-ratio', type=float, default=0.01, help="Share of sites changed before the sync")
+    parser.add_argument('--skip-qdrant', action='store_true', help="Only benchmark the PostgreSQL import")
+    parser.add_argument('--data-dir', default=None, help="Where to write the CSVs (default: a temp dir)")
+    parser.add_argument('--output', default=None, help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("CoSpa - Import Benchmark")
+    print("=" * 60)
+
+    if args.database == os.getenv('POSTGRES_DB'):
+        print(f"\n✗ Error: --database must not be POSTGRES_DB ({args.database}); the benchmark truncates sites")
+        sys.exit(1)
+    # Every module (and worker process) below reads its connection settings from here
+    os.environ['POSTGRES_DB'] = args.database
+
+    import psycopg
+    from import_csv import create_tables
+    from import_all import connect_postgres, import_parallel
+    from site_loader import load_csv_file, ensure_staging_table, STAGING_TABLE
+
+    results = {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'stages': {},
+    }
+
+    try:
+        with tempfile.TemporaryDirectory(prefix='cospa_bench_') as tmp:
+            data_dir = Path(args.data_dir or tmp)
+
+            csv_files = run_stage(results, 'generate', lambda: {
+                'files': [str(path) for path in generate_csvs(
+                    data_dir, args.rows, args.files, args.duplicate_ratio, args.malformed_ratio, args.seed
+                )],
+                'rows': args.rows,
+            })['files']
+            results['stages']['generate']['bytes'] = sum(Path(path).stat().st_size for path in csv_files)
+
+            print(f"\nPreparing database {args.database}...")
+            with connect_postgres() as conn:
+                with conn.cursor() as cursor:
+                    create_tables(cursor)
+                    ensure_staging_table(cursor)
+                    cursor.execute(f"TRUNCATE sites, import_checkpoints, {STAGING_TABLE} CASCADE")
+                conn.commit()
+
+            def import_files():
+                with connect_postgres() as conn:
+                    if args.jobs > 1 and len(csv_files) > 1:
+                        file_stats, merged, merge_seconds = import_parallel(
+                            conn, [Path(path) for path in csv_files], args.jobs
+                        )
+                        stats = {
+                            'rows': sum(s['rows'] for s in file_stats.values()),
+                            'skipped': sum(s['skipped'] for s in file_stats.values()),
+                            'copy_seconds': round(sum(s['copy_seconds'] for s in file_stats.values()), 3),
+                            'merge_seconds': round(merge_seconds, 3),
+                        }
+                        stats['inserted'], stats['updated'], stats['unchanged'], stats['deduplicated'] = merged
+                        return stats
+                    totals = dict.fromkeys(['rows', 'skipped', 'inserted', 'updated', 'unchanged', 'deduplicated',
+                                            'copy_seconds', 'merge_seconds'], 0)
+                    for path in csv_files:
+                        stats = load_csv_file(conn, path)
+                        for key in totals:
+                            totals[key] += stats[key]
+                    totals['copy_seconds'] = round(totals['copy_seconds'], 3)
+                    totals['merge_seconds'] = round(totals['merge_seconds'], 3)
+                    return totals
+
+            run_stage(results, 'import', import_files)
+            # Same files again: every row should come out unchanged (content hash)
+            stats = run_stage(results, 'reimport_unchanged', import_files)
+            if stats['inserted'] or stats['updated']:
+                raise RuntimeError(f"Unchanged re-import wrote rows: {stats['inserted']} new, "
+                                   f"{stats['updated']} updated")
+            print(f"✓ Re-import wrote nothing ({stats['unchanged']} unchanged, "
+                  f"{stats['deduplicated']} duplicate place_id)")
+
+            if not args.skip_qdrant:
+                run_qdrant_stages(results, args)
+
+    except psycopg.Error as e:
+        print(f"\n✗ Database error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+    results['peak_rss_mb'] = peak_rss_mb()
+    report = json.dumps(results, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        Path(args.output).write_text(report, encoding='utf-8')
+
+    print("\n" + "=" * 60)
+    print("Benchmark Results")
+    print("=" * 60)
+    print(report)
+    if args.output:
+        print(f"\n✓ Saved results to {args.output}")
+
+def run_qdrant_stages(results, args):
+    """Full rebuild into the Qdrant stand-in, then an incremental sync of changed sites"""
+    from qdrant_client import QdrantClient
+    import import_to_qdrant
+    from import_to_qdrant import (
+        Embedder, upload_to_qdrant, stream_sites_from_postgres, count_active_sites,
+        new_collection_name, switch_alias, sync_to_qdrant, connect_postgres
+    )
+    from services.embedding_backend import load_embedding_model
+
+    if args.qdrant_url:
+        qdrant_client = QdrantClient(url=args.qdrant_url)
+        upsert_workers = import_to_qdrant.UPSERT_WORKERS
+    else:
+        # The in-process client is not safe for concurrent upserts
+        qdrant_client = QdrantClient(location=':memory:')
+        upsert_workers = 1
+
+    model = load_embedding_model() if args.embeddings == 'model' else HashEmbeddingModel()
+    embedder = Embedder(model, workers=1 if args.embeddings == 'hash' else import_to_qdrant.EMBED_WORKERS)
+    state = {}
+
+    def rebuild():
+        collection_name = new_collection_name()
+        rows, state['watermark'], stage_stats = upload_to_qdrant(
+            qdrant_client, embedder, collection_name, stream_sites_from_postgres(),
+            total=count_active_sites(), upsert_workers=upsert_workers
+        )
+        switch_alias(qdrant_client, collection_name)
+        return {'rows': rows, 'pipeline': {
+            stage.name: {'rows': stage.rows, 'busy_seconds': round(stage.busy_seconds, 3),
+                         'rows_per_sec': round(stage.rows_per_second, 1), 'workers': stage.workers}
+            for stage in stage_stats
+        }}
+
+    def sync():
+        with connect_postgres() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE sites SET name = name || ' (mới)', updated_at = NOW()
+                    WHERE random() < %s
+                """, (args.sync_ratio,))
+                changed = cursor.rowcount
+            conn.commit()
+        # The sync overlap window would re-read every freshly imported row
+        import_to_qdrant.SYNC_OVERLAP_MINUTES = 0
+        _, stats = sync_to_qdrant(qdrant_client, embedder, state['watermark'])
+        return {'sites_changed': changed, 'rows': stats['changed_rows'], **stats}
+
+    try:
+        run_stage(results, 'qdrant_rebuild', rebuild)
+        run_stage(results, 'qdrant_sync', sync)
+    finally:
+        embedder.close()
+        qdrant_client.close()
+
+if __name__ == "__main__":
+    main()
@@ -80,9 +80,13 @@ def create_all_tables(cursor):
             created_at TIMESTAMP DEFAULT NOW(),
             updated_at TIMESTAMP DEFAULT NOW(),
             is_active BOOLEAN DEFAULT TRUE,
-            is_verified BOOLEAN DEFAULT FALSE
+            is_verified BOOLEAN DEFAULT FALSE,
+            content_hash CHAR(32)
         );
         
+        -- Change detection for CSV re-imports (migration 010)
+        ALTER TABLE sites ADD COLUMN IF NOT EXISTS content_hash CHAR(32);
+        
         CREATE INDEX IF NOT EXISTS idx_sites_location ON sites(lat, lng);
         CREATE INDEX IF NOT EXISTS idx_sites_type ON sites(type);
         CREATE INDEX IF NOT EXISTS idx_sites_city ON sites(city);
@@ -374,6 +378,33 @@ def create_all_tables(cursor):
         CREATE INDEX IF NOT EXISTS idx_site_notes_created ON site_notes(created_at);
     """)
     print("✓ Created table: site_notes")
+    
+    # 18. Vector_Sync_State table (watermark for import_to_qdrant.py --sync)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS vector_sync_state (
+            collection_name VARCHAR(255) PRIMARY KEY,
+            last_synced_at TIMESTAMP NOT NULL,
+            points_count INTEGER,
+            synced_at TIMESTAMP DEFAULT NOW()
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_sites_updated_at ON sites(updated_at);
+    """)
+    print("✓ Created table: vector_sync_state")
+    
+    # 19. Import_Checkpoints table (resumable CSV imports, see site_loader.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            file_hash CHAR(64) PRIMARY KEY,
+            file_name VARCHAR(500) NOT NULL,
+            byte_offset BIGINT NOT NULL DEFAULT 0,
+            row_num BIGINT NOT NULL DEFAULT 1,
+            rows_loaded BIGINT NOT NULL DEFAULT 0,
+            completed_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT NOW()
+        );
+    """)
+    print("✓ Created table: import_checkpoints")
 
 def main():
     """Main function to create all tables"""
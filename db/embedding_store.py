@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+On-disk embedding cache keyed by (model, text hash)
+import_to_qdrant.py looks texts up here first, so rebuilds, alias swaps and recoveries
+only embed texts that are genuinely new. One process at a time may open a model's store
+
+Layout, one directory per model and backend:
+    vectors.npy   float32 rows, memory-mapped and grown by doubling
+    index.npy     (hash, row) records sorted by hash; its length is the number of rows in use
+
+Usage:
+    python embedding_store.py stats     # size of every model directory
+    python embedding_store.py compact   # drop vectors no active site uses any more
+"""
+
+import argparse
+from dotenv import load_dotenv
+import fcntl
+import hashlib
+from pathlib import Path
+import os
+import re
+import shutil
+import sys
+import numpy as np
+
+# Load environment variables
+load_dotenv()
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+from services.embedding_backend import EMBEDDING_MODEL_PATH, EMBEDDING_BACKEND, EMBEDDING_QUANTIZATION
+
+EMBEDDING_STORE_PATH = os.getenv('EMBEDDING_STORE_PATH',
+                                 str(Path(__file__).resolve().parent.parent / 'embedding_store'))
+
+INDEX_DTYPE = np.dtype([('hash', 'S16'), ('row', '<u4')])
+MIN_CAPACITY = 1024
+# Unflushed rows are written to the index at least this often, so a crash loses little
+FLUSH_EVERY = 10000
+
+def text_key(text):
+    """128-bit prefix of the text's SHA-256 (the payload's content_hash)"""
+    return hashlib.sha256(text.encode('utf-8')).digest()[:16]
+
+def model_key(model_path=EMBEDDING_MODEL_PATH, backend=EMBEDDING_BACKEND, quantization=EMBEDDING_QUANTIZATION):
+    # Exports, backends and int8 builds are keyed separately: their vectors are close to,
+    # not equal to, each other
+    if os.path.isdir(model_path):
+        model_path = os.path.abspath(model_path)
+    if backend == 'onnx-int8':
+        return f"{model_path}@{backend}-{quantization}"
+    return f"{model_path}@{backend}"
+
+class StoreLockedError(RuntimeError):
+    """Another process has the store open"""
+
+def _save_atomic(path, array):
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+class EmbeddingStore:
+    """
+    Append-only vector cache for one model
+    Holds an exclusive lock from open to close(), so a --sync cannot append while a
+    rebuild or compact rewrites the files
+    """
+
+    def __init__(self, path=EMBEDDING_STORE_PATH, key=None):
+        self.key = key or model_key()
+        self.path = Path(path) / re.sub(r'[^A-Za-z0-9._-]+', '_', self.key)
+        self.hits = 0
+        self.misses = 0
+        self._lock()
+        self._recover()
+
+        index_path = self.path / 'index.npy'
+        self._index = np.load(index_path) if index_path.exists() else np.empty(0, dtype=INDEX_DTYPE)
+        vectors_path = self.path / 'vectors.npy'
+        self._vectors = np.load(vectors_path, mmap_mode='r+') if vectors_path.exists() else None
+        self._pending = {}
+
+    def _lock(self):
+        # Next to the directory, which compact() renames
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.path.with_name(self.path.name + '.lock'), 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise StoreLockedError(f"Embedding store {self.path} is in use by another process")
+
+    def close(self):
+        """Flush pending rows and release the lock"""
+        if self._lock_file is None:
+            return
+        self.flush()
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+        self._lock_file = None
+
+    def _recover(self):
+        """Finish a compaction interrupted between its two renames"""
+        compacted = self.path.with_name(self.path.name + '.compact')
+        if not self.path.exists() and (compacted / 'index.npy').exists():
+            os.rename(compacted, self.path)
+        shutil.rmtree(self.path.with_name(self.path.name + '.old'), ignore_errors=True)
+
+    def __len__(self):
+        return len(self._index) + len(self._pending)
+
+    @property
+    def dimension(self):
+        return self._vectors.shape[1] if self._vectors is not None else None
+
+    def _rows(self, keys):
+        """Row per key, -1 when absent"""
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if len(self._index) and len(keys):
+            wanted = np.array(keys, dtype='S16')
+            positions = np.minimum(np.searchsorted(self._index['hash'], wanted), len(self._index) - 1)
+            found = self._index['hash'][positions] == wanted
+            rows[found] = self._index['row'][positions[found]]
+        for i, key in enumerate(keys):
+            if rows[i] < 0 and key in self._pending:
+                rows[i] = self._pending[key]
+        return rows
+
+    def get(self, texts):
+        """Cached vector per text, None for misses"""
+        rows = self._rows([text_key(text) for text in texts])
+        hits = int((rows >= 0).sum())
+        self.hits += hits
+        self.misses += len(texts) - hits
+        return [np.array(self._vectors[row]) if row >= 0 else None for row in rows]
+
+    def put(self, texts, vectors):
+        """Store vectors of texts that are not cached yet"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        keys = [text_key(text) for text in texts]
+        new = [i for i, row in enumerate(self._rows(keys)) if row < 0]
+        new = list({keys[i]: i for i in new}.values())
+        if not new:
+            return
+
+        count = len(self)
+        self._reserve(count + len(new), vectors.shape[1])
+        self._vectors[count:count + len(new)] = vectors[new]
+        for offset, i in enumerate(new):
+            self._pending[keys[i]] = count + offset
+        if len(self._pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def _reserve(self, rows, dimension):
+        if self._vectors is not None and self.dimension != dimension:
+            raise ValueError(f"Store {self.path} holds {self.dimension}-d vectors, got {dimension}-d")
+        capacity = len(self._vectors) if self._vectors is not None else 0
+        if rows <= capacity:
+            return
+
+        # Grow into a new file and swap it in; rows already indexed keep their numbers
+        self.path.mkdir(parents=True, exist_ok=True)
+        grown_path = self.path / 'vectors.npy.grow'
+        grown = np.lib.format.open_memmap(grown_path, mode='w+', dtype=np.float32,
+                                          shape=(max(rows, 2 * capacity, MIN_CAPACITY), dimension))
+        if capacity:
+            grown[:capacity] = self._vectors
+        grown.flush()
+        del grown
+        self._vectors = None
+        os.replace(grown_path, self.path / 'vectors.npy')
+        self._vectors = np.load(self.path / 'vectors.npy', mmap_mode='r+')
+
+    def flush(self):
+        """Persist pending rows; the index is written last so it never points at unwritten vectors"""
+        if not self._pending:
+            return
+        self._vectors.flush()
+        pending = np.array(list(self._pending.items()), dtype=INDEX_DTYPE)
+        index = np.concatenate([self._index, pending])
+        index.sort(order='hash', kind='stable')
+        _save_atomic(self.path / 'index.npy', index)
+        self._index = index
+        self._pending = {}
+
+    def compact(self, keep_texts):
+        """Rewrite the store with only the vectors of `keep_texts`; returns rows dropped"""
+        self.flush()
+        keep = np.unique(np.array([text_key(text) for text in keep_texts], dtype='S16'))
+        index = self._index[np.isin(self._index['hash'], keep)]
+        dropped = len(self._index) - len(index)
+        if not dropped:
+            return 0
+
+        compacted = self.path.with_name(self.path.name + '.compact')
+        shutil.rmtree(compacted, ignore_errors=True)
+        compacted.mkdir(parents=True)
+        vectors = np.lib.format.open_memmap(compacted / 'vectors.npy', mode='w+', dtype=np.float32,
+                                            shape=(max(len(index), MIN_CAPACITY), self.dimension))
+        vectors[:len(index)] = self._vectors[np.sort(index['row'])]
+        vectors.flush()
+        del vectors
+
+        # Rows keep their relative order, so a row's new number is its rank among kept rows
+        new_index = index.copy()
+        new_index['row'] = np.searchsorted(np.sort(index['row']), index['row'])
+        _save_atomic(compacted / 'index.npy', new_index)
+
+        self._vectors = None
+        old = self.path.with_name(self.path.name + '.old')
+        os.rename(self.path, old)
+        os.rename(compacted, self.path)
+        shutil.rmtree(old, ignore_errors=True)
+
+        self._index = new_index
+        self._vectors = np.load(self.path / 'vectors.npy', mmap_mode='r+')
+        return dropped
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'vectors': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+def directory_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file())
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Inspect or compact the embedding store")
+    parser.add_argument('command', choices=['stats', 'compact'])
+    parser.add_argument('--path', default=EMBEDDING_STORE_PATH, help="Store directory")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("CoSpa - Embedding Store")
+    print("=" * 60)
+
+    if args.command == 'stats':
+        root = Path(args.path)
+        directories = sorted(d for d in root.iterdir() if d.is_dir()) if root.exists() else []
+        if not directories:
+            print(f"\nNo embeddings stored in {root}")
+        for directory in directories:
+            index_path = directory / 'index.npy'
+            rows = len(np.load(index_path, mmap_mode='r')) if index_path.exists() else 0
+            print(f"\n{directory.name}")
+            print(f"  Vectors: {rows}")
+            print(f"  Size: {directory_size(directory) / 1024 / 1024:.1f} MB")
+        return
+
+    # Texts of the active sites are the only ones a rebuild would look up
+    from import_to_qdrant import stream_sites_from_postgres, create_site_text
+
+    try:
+        store = EmbeddingStore(args.path)
+        print(f"\nStore: {store.path} ({len(store)} vectors)")
+        texts = [create_site_text(site) for batch in stream_sites_from_postgres() for site in batch]
+        print(f"✓ Fetched {len(texts)} active site texts")
+
+        size_before = directory_size(store.path) if store.path.exists() else 0
+        dropped = store.compact(texts)
+        store.close()
+        size_after = directory_size(store.path) if store.path.exists() else 0
+
+        print("\n" + "=" * 60)
+        print(f"✓ Dropped {dropped} vectors, {len(store)} kept")
+        print(f"Size: {size_before / 1024 / 1024:.1f} MB -> {size_after / 1024 / 1024:.1f} MB")
+        print("=" * 60)
+
+    except Exception as e:
+        print(f"\n✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
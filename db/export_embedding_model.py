@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Script to export the embedding model to ONNX (optionally dynamic-int8-quantized)
+and check that the converted model agrees with the original PyTorch model
+
+Usage:
+    python export_embedding_model.py --backend onnx-int8 --output ../models/minilm-l12
+    python export_embedding_model.py --backend onnx-int8 --output ../models/minilm-l12 --check-only
+
+Then point both the API and import_to_qdrant.py at it:
+    EMBEDDING_BACKEND=onnx-int8 EMBEDDING_MODEL_PATH=/abs/path/to/models/minilm-l12
+"""
+
+import argparse
+from dotenv import load_dotenv
+from pathlib import Path
+import sys
+
+# Load environment variables
+load_dotenv()
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+from services.embedding_backend import (
+    MODEL_NAME, EMBEDDING_QUANTIZATION, PARITY_SENTENCES,
+    load_embedding_model, cosine_agreement, onnx_file_name,
+)
+
+# Minimum cosine similarity to the PyTorch embedding, per backend
+DEFAULT_THRESHOLDS = {
+    'onnx': 0.999,
+    'onnx-int8': 0.97,
+}
+
+def export_model(backend, output_dir, quantization):
+    """Export the ONNX model (and its int8-quantized variant) into output_dir"""
+    print(f"\nExporting {MODEL_NAME} to ONNX...")
+    onnx_model = SentenceTransformer(MODEL_NAME, backend="onnx", model_kwargs={"export": True})
+    onnx_model.save_pretrained(str(output_dir))
+    print(f"✓ Saved {output_dir / onnx_file_name('onnx')}")
+    
+    if backend == 'onnx-int8':
+        print(f"\nQuantizing to dynamic int8 ({quantization})...")
+        export_dynamic_quantized_onnx_model(onnx_model, quantization, str(output_dir))
+        print(f"✓ Saved {output_dir / onnx_file_name(backend, quantization)}")
+
+def check_parity(backend, output_dir, quantization, threshold):
+    """Compare the converted model with PyTorch on sample queries and site texts"""
+    print(f"\nChecking parity of '{backend}' against PyTorch (threshold {threshold})...")
+    reference = SentenceTransformer(MODEL_NAME)
+    candidate = load_embedding_model(backend, str(output_dir), quantization)
+    scores = cosine_agreement(reference, candidate)
+    
+    for sentence, score in zip(PARITY_SENTENCES, scores):
+        marker = "✓" if score >= threshold else "✗"
+        print(f"  {marker} {score:.5f}  {sentence}")
+    
+    print(f"\nMin cosine: {scores.min():.5f}, mean cosine: {scores.mean():.5f}")
+    return bool(scores.min() >= threshold)
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX / int8 ONNX")
+    parser.add_argument('--backend', choices=['onnx', 'onnx-int8'], default='onnx-int8')
+    parser.add_argument('--output', required=True, help="Directory for the exported model")
+    parser.add_argument('--quantization', default=EMBEDDING_QUANTIZATION,
+                        choices=['avx2', 'avx512', 'avx512_vnni', 'arm64'],
+                        help="Target instruction set for int8 quantization")
+    parser.add_argument('--threshold', type=float, default=None,
+                        help="Minimum cosine agreement with PyTorch (default depends on backend)")
+    parser.add_argument('--check-only', action='store_true', help="Skip export, only run the parity check")
+    args = parser.parse_args()
+    
+    output_dir = Path(args.output).resolve()
+    threshold = args.threshold if args.threshold is not None else DEFAULT_THRESHOLDS[args.backend]
+    
+    print("=" * 60)
+    print("CoSpa - Export Embedding Model")
+    print("=" * 60)
+    
+    try:
+        if not args.check_only:
+            export_model(args.backend, output_dir, args.quantization)
+        
+        if not check_parity(args.backend, output_dir, args.quantization, threshold):
+            print(f"\n✗ Parity check failed: '{args.backend}' disagrees with PyTorch beyond {threshold}")
+            sys.exit(1)
+        
+        print("\n✓ Parity check passed")
+        print(f"\nUse it with:\n  EMBEDDING_BACKEND={args.backend} EMBEDDING_MODEL_PATH={output_dir}"
+              + (f" EMBEDDING_QUANTIZATION={args.quantization}" if args.backend == 'onnx-int8' else ""))
+        
+    except Exception as e:
+        print(f"\n✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Script to export the Qdrant collection into a local index directory
+used by the API's embedded search backend (SEARCH_BACKEND=local)
+
+Usage:
+    python export_local_index.py --output ../local_index
+
+Then run the API without the hosted cluster:
+    SEARCH_BACKEND=local LOCAL_INDEX_PATH=/abs/path/to/local_index
+"""
+
+import argparse
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from pathlib import Path
+import json
+import os
+import sys
+import numpy as np
+from qdrant_client import QdrantClient
+
+# Load environment variables
+load_dotenv()
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+from services.backends import COLLECTION_NAME
+from services.embedding_backend import MODEL_NAME, EMBEDDING_BACKEND
+
+QDRANT_URL = os.getenv('QDRANT_API_URL')
+QDRANT_API_KEY = os.getenv('QDRANT_API_KEY')
+
+def fetch_points(qdrant_client):
+    """Scroll every point with its vector and payload"""
+    points = []
+    offset = None
+    while True:
+        batch, offset = qdrant_client.scroll(
+            collection_name=COLLECTION_NAME,
+            limit=1000,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        points.extend(batch)
+        print(f"  fetched {len(points)} points...", end="\r")
+        if offset is None:
+            print()
+            return points
+
+def write_index(points, output_dir):
+    """Write vectors.npy (L2-normalized float32), points.jsonl and meta.json"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    vectors = np.array([point.vector for point in points], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms > 0, norms, 1.0)
+    np.save(output_dir / 'vectors.npy', vectors)
+    print(f"✓ Saved {output_dir / 'vectors.npy'} {vectors.shape}")
+
+    with open(output_dir / 'points.jsonl', 'w', encoding='utf-8') as f:
+        for point in points:
+            f.write(json.dumps({'id': point.id, 'payload': point.payload}, ensure_ascii=False) + '\n')
+    print(f"✓ Saved {output_dir / 'points.jsonl'}")
+
+    meta = {
+        'collection': COLLECTION_NAME,
+        'model': MODEL_NAME,
+        'embedding_backend': EMBEDDING_BACKEND,
+        'points': len(points),
+        'dimension': int(vectors.shape[1]) if len(points) else 0,
+        'exported_at': datetime.now(timezone.utc).isoformat(),
+    }
+    (output_dir / 'meta.json').write_text(json.dumps(meta, indent=2), encoding='utf-8')
+    print(f"✓ Saved {output_dir / 'meta.json'}")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Export the Qdrant collection for the local search backend")
+    parser.add_argument('--output', default=str(Path(__file__).resolve().parent.parent / 'local_index'),
+                        help="Output directory")
+    args = parser.parse_args()
+    output_dir = Path(args.output).resolve()
+
+    print("=" * 60)
+    print("CoSpa - Export Local Search Index")
+    print("=" * 60)
+
+    if not QDRANT_URL or not QDRANT_API_KEY:
+        print("\n✗ Error: Missing QDRANT_API_URL or QDRANT_API_KEY in .env")
+        sys.exit(1)
+
+    try:
+        print(f"\nConnecting to Qdrant at {QDRANT_URL}...")
+        qdrant_client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+
+        print(f"\nFetching points from '{COLLECTION_NAME}'...")
+        points = fetch_points(qdrant_client)
+        if not points:
+            print("\n✗ Collection is empty")
+            sys.exit(1)
+
+        write_index(points, output_dir)
+
+        print("\n" + "=" * 60)
+        print(f"✓ Exported {len(points)} points to {output_dir}")
+        print("=" * 60)
+
+    except Exception as e:
+        print(f"\n✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
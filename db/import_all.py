@@ -2,15 +2,29 @@
 """
 Script to import all CSV files from db/data directory into PostgreSQL database
 Excludes HaNoi.csv which has already been imported
+
+Usage:
+    python import_all.py             # one file after another, committed in chunks
+    python import_all.py --jobs 8    # stage files on 8 worker processes, then merge once
+    python import_all.py --restart   # start interrupted files over instead of resuming them
+
+An interrupted import resumes where it stopped. Files that were imported completely are
+read again, and only rows whose content changed are written
 """
 
-import csv
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import psycopg
 from dotenv import load_dotenv
 import os
 import sys
-from decimal import Decimal
+import time
+import uuid
 from pathlib import Path
+from site_loader import (
+    load_csv_file, ensure_staging_table, stage_csv_file, merge_staging, discard_staging,
+    file_hash, save_checkpoint
+)
 
 # Load environment variables
 load_dotenv()
@@ -27,113 +41,103 @@ DB_CONFIG = {
 DATA_DIR = 'data'
 EXCLUDE_FILES = ['HaNoi.csv']  # Already imported
 
-def parse_decimal(value):
-    """Parse decimal value from string, handling empty values"""
-    if not value or value.strip() == '':
-        return None
-    try:
-        # Replace comma with dot for decimal separator
-        value = value.replace(',', '.')
-        return Decimal(value)
-    except:
-        return None
-
-def parse_integer(value):
-    """Parse integer value from string, handling empty values"""
-    if not value or value.strip() == '':
-        return None
-    try:
-        return int(value)
-    except:
-        return None
-
-def clean_string(value):
-    """Clean string value, return None for empty strings"""
-    if not value or value.strip() == '':
-        return None
-    return value.strip()
+def connect_postgres():
+    return psycopg.connect(
+        host=DB_CONFIG['host'],
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
+        dbname=DB_CONFIG['database'],
+        port=DB_CONFIG['port']
+    )
 
-def import_csv_file(cursor, csv_file_path):
-    """Import data from a single CSV file into the database"""
+def import_csv_file(conn, csv_file_path, restart=False):
+    """Import data from a single CSV file into the database (COPY into staging, then merge)"""
     
     file_name = os.path.basename(csv_file_path)
     print(f"\n{'='*60}")
     print(f"Importing: {file_name}")
     print('='*60)
     
-    with open(csv_file_path, 'r', encoding='utf-8') as file:
-        # Read CSV with semicolon delimiter
-        csv_reader = csv.DictReader(file, delimiter=';')
-        
-        rows_to_insert = []
-        skipped_rows = 0
-        
-        for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 because row 1 is header
+    stats = load_csv_file(conn, csv_file_path, restart=restart)
+    
+    if stats['resumed_from_row']:
+        print(f"↻ Resumed from row {stats['resumed_from_row']}")
+    if stats['rows']:
+        print(f"✓ Successfully imported {stats['rows']} records "
+              f"({stats['inserted']} new, {stats['updated']} updated, {stats['unchanged']} unchanged, "
+              f"{stats['deduplicated']} duplicate place_id) in {stats['copy_seconds'] + stats['merge_seconds']:.1f}s")
+        if stats['skipped'] > 0:
+            print(f"⚠ Skipped {stats['skipped']} rows due to errors")
+    else:
+        print("✗ No valid data to import")
+    
+    return stats
+
+def stage_file_worker(csv_file_path):
+    """Worker process: COPY one file into staging on its own connection and transaction"""
+    load_id = uuid.uuid4()
+    with connect_postgres() as conn:
+        with conn.cursor() as cursor:
+            stats = stage_csv_file(cursor, csv_file_path, load_id)
+        conn.commit()
+    return load_id, stats
+
+def import_parallel(conn, csv_files, jobs):
+    """
+    Stage files on `jobs` worker processes, then merge every load in one transaction
+    Loads are merged in file order, so a place_id found in several files gets the same
+    row as in a sequential import, whichever worker finished first. Files are staged
+    whole (an interrupted one starts over) and the merge marks them completed.
+    Returns ({file: stats}, (inserted, updated, unchanged, deduplicated), merge seconds)
+    """
+    hashes = {csv_file: file_hash(csv_file) for csv_file in csv_files}
+    with conn.cursor() as cursor:
+        ensure_staging_table(cursor)
+    conn.commit()
+    
+    staged = {}
+    errors = []
+    # Largest files first so one big province does not start last
+    ordered = sorted(csv_files, key=lambda f: f.stat().st_size, reverse=True)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(stage_file_worker, str(csv_file)): csv_file for csv_file in ordered}
+        for future in as_completed(futures):
+            csv_file = futures[future]
             try:
-                # Map CSV columns to database columns
-                # Handle BOM in first column name
-                name_col = '\ufeffTên địa điểm' if '\ufeffTên địa điểm' in row else 'Tên địa điểm'
-                data = (
-                    clean_string(row.get(name_col)),
-                    clean_string(row.get('Loại hình')),
-                    clean_string(row.get('Thương hiệu/Chuỗi')),
-                    clean_string(row.get('Địa chỉ cũ')),
-                    clean_string(row.get('Địa chỉ mới')),
-                    clean_string(row.get('Số nhà / Đường')),
-                    clean_string(row.get('Phường')),
-                    None,  # district - not in CSV, will extract from ward if needed
-                    clean_string(row.get('Tỉnh/Thành phố')),
-                    clean_string(row.get('Khu vực')),
-                    clean_string(row.get('Link Google Maps')),
-                    clean_string(row.get('Website/MXH')),
-                    clean_string(row.get('Ảnh (URL)')),
-                    parse_decimal(row.get('Vĩ độ')),
-                    parse_decimal(row.get('Kinh độ')),
-                    clean_string(row.get('Ghi chú')),
-                    clean_string(row.get('SĐT')),
-                    parse_decimal(row.get('Điểm rating')),
-                    parse_integer(row.get('Số review')),
-                    clean_string(row.get('Query nguồn')),
-                    clean_string(row.get('Place ID')),
-                    clean_string(row.get('Data ID')),
-                    clean_string(row.get('CID'))
-                )
-                
-                rows_to_insert.append(data)
-                
+                staged[csv_file] = future.result()
             except Exception as e:
-                print(f"⚠ Warning: Skipped row {row_num} due to error: {e}")
-                skipped_rows += 1
+                errors.append(f"{csv_file.name}: {e}")
+                print(f"✗ Failed to stage {csv_file.name}: {e}")
                 continue
+            stats = staged[csv_file][1]
+            print(f"✓ Staged {csv_file.name}: {stats['rows']} rows in {stats['copy_seconds']:.1f}s"
+                  + (f" ({stats['skipped']} skipped)" if stats['skipped'] else ""))
+    
+    with conn.cursor() as cursor:
+        if errors:
+            # All or nothing: drop what the other workers staged
+            discard_staging(cursor, [load_id for load_id, _ in staged.values()])
+            conn.commit()
+            raise RuntimeError(f"{len(errors)} file(s) failed to stage: {'; '.join(errors)}")
         
-        # Bulk insert for better performance
-        if rows_to_insert:
-            insert_sql = """
-                INSERT INTO sites (
-                    name, type, brand, old_address, new_address, num_address,
-                    ward, district, city, area, link_google, link_web, thumbnail_url,
-                    lat, lng, note, phone_number, rating, review_count,
-                    query_source, place_id, data_id, cid
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (place_id) DO UPDATE SET
-                    name = EXCLUDED.name,
-                    type = EXCLUDED.type,
-                    brand = EXCLUDED.brand,
-                    rating = EXCLUDED.rating,
-                    review_count = EXCLUDED.review_count,
-                    updated_at = NOW()
-            """
-            
-            cursor.executemany(insert_sql, rows_to_insert)
-            
-            print(f"✓ Successfully imported {len(rows_to_insert)} records")
-            if skipped_rows > 0:
-                print(f"⚠ Skipped {skipped_rows} rows due to errors")
-            
-            return len(rows_to_insert), skipped_rows
-        else:
-            print("✗ No valid data to import")
-            return 0, skipped_rows
+        print(f"\nMerging {len(staged)} staged files into sites...")
+        started = time.perf_counter()
+        merged = (0, 0, 0, 0)
+        try:
+            if staged:
+                merged = merge_staging(cursor, [staged[csv_file][0] for csv_file in csv_files])
+            for csv_file, (_, stats) in staged.items():
+                save_checkpoint(cursor, hashes[csv_file], csv_file.name, stats['byte_offset'],
+                                stats['row_num'], stats['rows'], completed=True)
+            conn.commit()
+        except Exception:
+            # The workers committed their loads, so the rollback alone would leave them staged
+            conn.rollback()
+            discard_staging(cursor, [load_id for load_id, _ in staged.values()])
+            conn.commit()
+            raise
+    
+    return {csv_file: stats for csv_file, (_, stats) in staged.items()}, merged, time.perf_counter() - started
 
 def get_csv_files():
     """Get list of CSV files to import (excluding specified files)"""
@@ -148,6 +152,13 @@ def get_csv_files():
 
 def main():
     """Main function to run the import process"""
+    parser = argparse.ArgumentParser(description="Import all CSV files into PostgreSQL")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Worker processes staging files in parallel (0 = one per CPU core)")
+    parser.add_argument('--restart', action='store_true',
+                        help="Start interrupted files over instead of resuming them from their checkpoint")
+    args = parser.parse_args()
+    jobs = args.jobs or os.cpu_count() or 1
     
     print("=" * 60)
     print("CoSpa Bulk CSV Import Tool")
@@ -178,26 +189,31 @@ def main():
     
     try:
         # Connect to PostgreSQL
-        conn = psycopg.connect(
-            host=DB_CONFIG['host'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            dbname=DB_CONFIG['database'],
-            port=DB_CONFIG['port']
-        )
+        conn = connect_postgres()
         cursor = conn.cursor()
         
         print("✓ Connected to database successfully")
         
         # Import each CSV file
-        total_imported = 0
-        total_skipped = 0
+        totals = dict.fromkeys(['rows', 'skipped', 'inserted', 'updated', 'unchanged', 'deduplicated'], 0)
+        file_stats = None
         
-        for csv_file in csv_files:
-            imported, skipped = import_csv_file(cursor, csv_file)
-            total_imported += imported
-            total_skipped += skipped
-            conn.commit()
+        if jobs > 1 and len(csv_files) > 1:
+            print(f"\nStaging {len(csv_files)} files with {min(jobs, len(csv_files))} worker processes...")
+            started = time.perf_counter()
+            file_stats, merged, merge_seconds = import_parallel(conn, csv_files, jobs)
+            totals['rows'] = sum(stats['rows'] for stats in file_stats.values())
+            totals['skipped'] = sum(stats['skipped'] for stats in file_stats.values())
+            totals['inserted'], totals['updated'], totals['unchanged'], totals['deduplicated'] = merged
+            print(f"✓ Merged {totals['rows']} records ({totals['inserted']} new, {totals['updated']} updated, "
+                  f"{totals['unchanged']} unchanged, {totals['deduplicated']} duplicate place_id) "
+                  f"in {merge_seconds:.1f}s")
+            print(f"✓ Total import time: {time.perf_counter() - started:.1f}s")
+        else:
+            for csv_file in csv_files:
+                stats = import_csv_file(conn, csv_file, restart=args.restart)
+                for key in totals:
+                    totals[key] += stats[key]
         
         # Get final statistics
         cursor.execute("SELECT COUNT(*) FROM sites")
@@ -213,9 +229,19 @@ def main():
         print("Import Summary")
         print("=" * 60)
         print(f"Files processed: {len(csv_files)}")
-        print(f"Records imported: {total_imported}")
-        if total_skipped > 0:
-            print(f"Records skipped: {total_skipped}")
+        print(f"Records imported: {totals['rows']}")
+        print(f"  New: {totals['inserted']}")
+        print(f"  Updated: {totals['updated']}")
+        print(f"  Unchanged: {totals['unchanged']}")
+        print(f"  Duplicate place_id (merged into one row): {totals['deduplicated']}")
+        if totals['skipped'] > 0:
+            print(f"Records skipped: {totals['skipped']}")
+        if file_stats:
+            print("\nPer file:")
+            for csv_file in csv_files:
+                stats = file_stats[csv_file]
+                print(f"  - {csv_file.name}: {stats['rows']} rows, {stats['skipped']} skipped, "
+                      f"{stats['copy_seconds']:.1f}s")
         print(f"\nTotal sites in database: {total_sites}")
         print(f"Sites with ratings: {sites_with_rating}")
         
@@ -1,14 +1,15 @@
 #!/usr/bin/env python3
 """
 Script to import data from HaNoi.csv into PostgreSQL database
+An interrupted import resumes where it stopped; pass --restart to start it over instead
 """
 
-import csv
+import argparse
 import psycopg
 from dotenv import load_dotenv
 import os
 import sys
-from decimal import Decimal
+from site_loader import load_csv_file
 
 # Load environment variables
 load_dotenv()
@@ -55,8 +56,10 @@ def create_tables(cursor):
         created_at TIMESTAMP DEFAULT NOW(),
         updated_at TIMESTAMP DEFAULT NOW(),
         is_active BOOLEAN DEFAULT TRUE,
-        is_verified BOOLEAN DEFAULT FALSE
+        is_verified BOOLEAN DEFAULT FALSE,
+        content_hash CHAR(32)
     );
+    ALTER TABLE sites ADD COLUMN IF NOT EXISTS content_hash CHAR(32);
     
     -- Create indexes
     CREATE INDEX IF NOT EXISTS idx_sites_location ON sites(lat, lng);
@@ -64,113 +67,44 @@ def create_tables(cursor):
     CREATE INDEX IF NOT EXISTS idx_sites_city ON sites(city);
     CREATE INDEX IF NOT EXISTS idx_sites_place_id ON sites(place_id);
     CREATE INDEX IF NOT EXISTS idx_sites_rating ON sites(rating);
+    
+    -- Progress of chunked imports (see site_loader.py)
+    CREATE TABLE IF NOT EXISTS import_checkpoints (
+        file_hash CHAR(64) PRIMARY KEY,
+        file_name VARCHAR(500) NOT NULL,
+        byte_offset BIGINT NOT NULL DEFAULT 0,
+        row_num BIGINT NOT NULL DEFAULT 1,
+        rows_loaded BIGINT NOT NULL DEFAULT 0,
+        completed_at TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT NOW()
+    );
     """
     
     cursor.execute(create_table_sql)
     print("✓ Tables and indexes created successfully")
 
-def parse_decimal(value):
-    """Parse decimal value from string, handling empty values"""
-    if not value or value.strip() == '':
-        return None
-    try:
-        # Replace comma with dot for decimal separator
-        value = value.replace(',', '.')
-        return Decimal(value)
-    except:
-        return None
-
-def parse_integer(value):
-    """Parse integer value from string, handling empty values"""
-    if not value or value.strip() == '':
-        return None
-    try:
-        return int(value)
-    except:
-        return None
-
-def clean_string(value):
-    """Clean string value, return None for empty strings"""
-    if not value or value.strip() == '':
-        return None
-    return value.strip()
-
-def import_csv_data(cursor, csv_file):
-    """Import data from CSV file into the database"""
+def import_csv_data(conn, csv_file, restart=False):
+    """Import data from CSV file into the database (COPY into staging, then merge)"""
     
-    with open(csv_file, 'r', encoding='utf-8') as file:
-        # Read CSV with semicolon delimiter
-        csv_reader = csv.DictReader(file, delimiter=';')
-        
-        rows_to_insert = []
-        skipped_rows = 0
-        
-        for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 because row 1 is header
-            try:
-                # Map CSV columns to database columns
-                # Handle BOM in first column name
-                name_col = '\ufeffTên địa điểm' if '\ufeffTên địa điểm' in row else 'Tên địa điểm'
-                data = (
-                    clean_string(row.get(name_col)),
-                    clean_string(row.get('Loại hình')),
-                    clean_string(row.get('Thương hiệu/Chuỗi')),
-                    clean_string(row.get('Địa chỉ cũ')),
-                    clean_string(row.get('Địa chỉ mới')),
-                    clean_string(row.get('Số nhà / Đường')),
-                    clean_string(row.get('Phường')),
-                    None,  # district - not in CSV, will extract from ward if needed
-                    clean_string(row.get('Tỉnh/Thành phố')),
-                    clean_string(row.get('Khu vực')),
-                    clean_string(row.get('Link Google Maps')),
-                    clean_string(row.get('Website/MXH')),
-                    clean_string(row.get('Ảnh (URL)')),
-                    parse_decimal(row.get('Vĩ độ')),
-                    parse_decimal(row.get('Kinh độ')),
-                    clean_string(row.get('Ghi chú')),
-                    clean_string(row.get('SĐT')),
-                    parse_decimal(row.get('Điểm rating')),
-                    parse_integer(row.get('Số review')),
-                    clean_string(row.get('Query nguồn')),
-                    clean_string(row.get('Place ID')),
-                    clean_string(row.get('Data ID')),
-                    clean_string(row.get('CID'))
-                )
-                
-                rows_to_insert.append(data)
-                
-            except Exception as e:
-                print(f"⚠ Warning: Skipped row {row_num} due to error: {e}")
-                skipped_rows += 1
-                continue
-        
-        # Bulk insert for better performance
-        if rows_to_insert:
-            insert_sql = """
-                INSERT INTO sites (
-                    name, type, brand, old_address, new_address, num_address,
-                    ward, district, city, area, link_google, link_web, thumbnail_url,
-                    lat, lng, note, phone_number, rating, review_count,
-                    query_source, place_id, data_id, cid
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (place_id) DO UPDATE SET
-                    name = EXCLUDED.name,
-                    type = EXCLUDED.type,
-                    brand = EXCLUDED.brand,
-                    rating = EXCLUDED.rating,
-                    review_count = EXCLUDED.review_count,
-                    updated_at = NOW()
-            """
-            
-            cursor.executemany(insert_sql, rows_to_insert)
-            
-            print(f"✓ Successfully imported {len(rows_to_insert)} records")
-            if skipped_rows > 0:
-                print(f"⚠ Skipped {skipped_rows} rows due to errors")
-        else:
-            print("✗ No valid data to import")
+    stats = load_csv_file(conn, csv_file, restart=restart)
+    
+    if stats['resumed_from_row']:
+        print(f"↻ Resumed from row {stats['resumed_from_row']}")
+    if stats['rows']:
+        print(f"✓ Successfully imported {stats['rows']} records "
+              f"({stats['inserted']} new, {stats['updated']} updated, {stats['unchanged']} unchanged, "
+              f"{stats['deduplicated']} duplicate place_id)")
+        if stats['skipped'] > 0:
+            print(f"⚠ Skipped {stats['skipped']} rows due to errors")
+    else:
+        print("✗ No valid data to import")
 
 def main():
     """Main function to run the import process"""
+    parser = argparse.ArgumentParser(description="Import HaNoi.csv into PostgreSQL")
+    parser.add_argument('--restart', action='store_true',
+                        help="Start an interrupted import over instead of resuming it from its checkpoint")
+    args = parser.parse_args()
     
     print("=" * 60)
     print("CoSpa CSV Import Tool")
@@ -207,8 +141,7 @@ def main():
         
         # Import CSV data
         print(f"\nImporting data from {CSV_FILE}...")
-        import_csv_data(cursor, CSV_FILE)
-        conn.commit()
+        import_csv_data(conn, CSV_FILE, restart=args.restart)
         
         # Get statistics
         cursor.execute("SELECT COUNT(*) FROM sites")
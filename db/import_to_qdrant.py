@@ -2,20 +2,40 @@
 """
 Script to import sites data from PostgreSQL into Qdrant vector database
 Uses sentence transformers to generate embeddings for semantic search
+
+Usage:
+    python import_to_qdrant.py          # full rebuild into a new collection, then switch the alias
+    python import_to_qdrant.py --sync   # incremental: only sites changed since the last run
+    python import_to_qdrant.py --sync --reconcile   # also delete points of sites removed from Postgres
 """
 
+import argparse
+from datetime import datetime, timedelta, timezone
+import hashlib
+import math
 import psycopg
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from sentence_transformers import SentenceTransformer
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, PayloadSchemaType, PointIdsList, OverwritePayloadOperation, SetPayload,
+    CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
+)
 from dotenv import load_dotenv
+from pathlib import Path
 import os
 import sys
+import urllib.request
 from tqdm import tqdm
+import numpy as np
+from pipeline import run_pipeline
+from embedding_store import EmbeddingStore, StoreLockedError
 
 # Load environment variables
 load_dotenv()
 
+# Share the embedding backend with the API so site and query vectors stay compatible
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+from services.embedding_backend import MODEL_NAME, EMBEDDING_BACKEND, load_embedding_model
+
 # Database configuration
 DB_CONFIG = {
     'host': os.getenv('POSTGRES_HOST'),
@@ -28,10 +48,59 @@ DB_CONFIG = {
 # Qdrant configuration
 QDRANT_URL = os.getenv('QDRANT_API_URL')
 QDRANT_API_KEY = os.getenv('QDRANT_API_KEY')
+# Alias the API queries. Full rebuilds write into a new `cospa_sites_v<timestamp>`
+# collection and switch the alias once it validates, so the live data is never dropped
 COLLECTION_NAME = "cospa_sites"
+COLLECTION_VERSIONS_TO_KEEP = int(os.getenv('QDRANT_COLLECTION_VERSIONS_TO_KEEP', '2'))
+
+# Queries a new collection must answer before the alias is switched to it
+VALIDATION_QUERIES = ["coworking space Hanoi", "quán cà phê yên tĩnh", "thư viện"]
+
+# Bump when the payload layout changes. v2 drops ward, area and place_id, which the API
+# never reads; `search_text` stays for the API's lexical index. v3 keys points by site
+# UUID and adds `content_hash` (of search_text) for incremental sync
+PAYLOAD_SCHEMA_VERSION = 3
+
+# Incremental sync re-reads rows updated this long before the watermark, so rows from
+# transactions that committed late are not missed (unchanged texts are not re-embedded)
+SYNC_OVERLAP_MINUTES = 10
+
+PAYLOAD_INDEXES = {
+    'location': PayloadSchemaType.GEO,
+    'type': PayloadSchemaType.KEYWORD,
+    'city': PayloadSchemaType.KEYWORD,
+    'rating': PayloadSchemaType.FLOAT,
+}
+
+# Full rebuilds stream rows through reader -> text -> embed -> upsert stages connected
+# by bounded queues, so memory stays flat and embedding overlaps with uploads
+PIPELINE_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '256'))
+PIPELINE_QUEUE_SIZE = int(os.getenv('IMPORT_QUEUE_SIZE', '8'))
+UPSERT_WORKERS = int(os.getenv('IMPORT_UPSERT_WORKERS', '4'))
+
+# Embedding processes (sentence-transformers multi-process pool), opt-in for big rebuilds:
+# 1 = encode in this process, 0 = one per CPU core. Each worker loads its own copy of the model
+EMBED_WORKERS = int(os.getenv('IMPORT_EMBED_WORKERS', '1')) or os.cpu_count() or 1
+EMBED_BATCH_SIZE = int(os.getenv('IMPORT_EMBED_BATCH_SIZE', '32'))
+# A --sync re-embedding fewer texts than this encodes in-process even with workers > 1
+EMBED_POOL_MIN_TEXTS = int(os.getenv('IMPORT_EMBED_POOL_MIN_TEXTS', '5000'))
+# Reuse vectors of unchanged texts across runs (see embedding_store.py)
+EMBEDDING_STORE_ENABLED = os.getenv('EMBEDDING_STORE_ENABLED', 'true').lower() == 'true'
 
-# Embedding model
-MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"  # Supports Vietnamese
+SITES_QUERY = """
+    SELECT 
+        id, name, type, brand, old_address, new_address, 
+        num_address, ward, district, city, area, 
+        link_google, link_web, thumbnail_url,
+        lat, lng, note, phone_number, rating, review_count,
+        query_source, place_id, data_id, cid,
+        is_active, updated_at
+    FROM sites
+"""
+
+# Running API to notify after a re-import (optional; both must be set)
+API_URL = os.getenv('API_URL')
+SEARCH_ADMIN_TOKEN = os.getenv('SEARCH_ADMIN_TOKEN')
 
 def create_site_text(site):
     """Create a searchable text representation of a site"""
@@ -54,32 +123,30 @@ def create_site_text(site):
     
     return " | ".join(parts)
 
-def fetch_sites_from_postgres():
-    """Fetch all active sites from PostgreSQL"""
-    print("Connecting to PostgreSQL...")
-    
-    conn = psycopg.connect(
+def content_hash(text):
+    """Hash of the embedded text; equal hashes mean the stored vector is still valid"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def connect_postgres():
+    return psycopg.connect(
         host=DB_CONFIG['host'],
         user=DB_CONFIG['user'],
         password=DB_CONFIG['password'],
         dbname=DB_CONFIG['database'],
         port=DB_CONFIG['port']
     )
-    cursor = conn.cursor()
-    
-    query = """
-        SELECT 
-            id, name, type, brand, old_address, new_address, 
-            num_address, ward, district, city, area, 
-            link_google, link_web, thumbnail_url,
-            lat, lng, note, phone_number, rating, review_count,
-            query_source, place_id, data_id, cid
-        FROM sites
-        WHERE is_active = TRUE
-        ORDER BY created_at DESC
+
+def fetch_sites_from_postgres(changed_since):
+    """
+    Fetch every site (active or not) updated after `changed_since`, so deactivations
+    can be applied too. Full rebuilds stream rows with `stream_sites_from_postgres`
     """
+    print("Connecting to PostgreSQL...")
+    
+    conn = connect_postgres()
+    cursor = conn.cursor()
     
-    cursor.execute(query)
+    cursor.execute(SITES_QUERY + " WHERE updated_at > %s ORDER BY updated_at", (changed_since,))
     columns = [desc[0] for desc in cursor.description]
     
     sites = []
@@ -93,95 +160,407 @@ def fetch_sites_from_postgres():
     print(f"✓ Fetched {len(sites)} sites from PostgreSQL")
     return sites
 
-def setup_qdrant_collection(qdrant_client, vector_size):
-    """Create or recreate Qdrant collection"""
-    
-    # Check if collection exists
-    collections = qdrant_client.get_collections().collections
-    collection_names = [c.name for c in collections]
-    
-    if COLLECTION_NAME in collection_names:
-        print(f"Collection '{COLLECTION_NAME}' already exists. Recreating...")
-        qdrant_client.delete_collection(collection_name=COLLECTION_NAME)
-    
-    # Create collection
+def count_active_sites():
+    with connect_postgres() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM sites WHERE is_active = TRUE")
+            return cursor.fetchone()[0]
+
+def stream_sites_from_postgres(batch_size=PIPELINE_BATCH_SIZE):
+    """Yield batches of active sites from a server-side cursor, never holding all rows"""
+    with connect_postgres() as conn:
+        with conn.cursor(name='import_to_qdrant_sites') as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(SITES_QUERY + " WHERE is_active = TRUE ORDER BY created_at DESC")
+            columns = [desc[0] for desc in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield [dict(zip(columns, row)) for row in rows]
+
+def get_sync_watermark():
+    """Latest sites.updated_at already pushed to the collection, or None"""
+    with connect_postgres() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT last_synced_at FROM vector_sync_state WHERE collection_name = %s",
+                (COLLECTION_NAME,)
+            )
+            row = cursor.fetchone()
+    return row[0] if row else None
+
+def save_sync_watermark(watermark, points_count):
+    with connect_postgres() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO vector_sync_state (collection_name, last_synced_at, points_count, synced_at)
+                VALUES (%s, %s, %s, NOW())
+                ON CONFLICT (collection_name) DO UPDATE SET
+                    last_synced_at = EXCLUDED.last_synced_at,
+                    points_count = EXCLUDED.points_count,
+                    synced_at = NOW()
+            """, (COLLECTION_NAME, watermark, points_count))
+        conn.commit()
+    print(f"✓ Saved sync watermark: {watermark}")
+
+def fetch_active_site_ids():
+    with connect_postgres() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM sites WHERE is_active = TRUE")
+            return {str(row[0]) for row in cursor.fetchall()}
+
+def new_collection_name():
+    return f"{COLLECTION_NAME}_v{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+
+def setup_qdrant_collection(qdrant_client, collection_name, vector_size):
+    """Create a new (versioned) collection with its payload indexes"""
     qdrant_client.create_collection(
-        collection_name=COLLECTION_NAME,
+        collection_name=collection_name,
         vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE),
     )
     
-    print(f"✓ Created collection '{COLLECTION_NAME}' with vector size {vector_size}")
-
-def upload_to_qdrant(qdrant_client, sites, model):
-    """Generate embeddings and upload to Qdrant"""
-    
-    print(f"\nGenerating embeddings for {len(sites)} sites...")
-    
-    # Prepare texts for embedding
-    texts = [create_site_text(site) for site in sites]
-    
-    # Generate embeddings in batches
-    batch_size = 32
-    all_embeddings = []
-    
-    for i in tqdm(range(0, len(texts), batch_size), desc="Embedding"):
-        batch_texts = texts[i:i + batch_size]
-        batch_embeddings = model.encode(batch_texts, show_progress_bar=False)
-        all_embeddings.extend(batch_embeddings)
-    
-    print(f"✓ Generated {len(all_embeddings)} embeddings")
-    
-    # Setup collection with correct vector size
-    vector_size = len(all_embeddings[0])
-    setup_qdrant_collection(qdrant_client, vector_size)
-    
-    # Prepare points for upload
-    points = []
-    for idx, (site, embedding) in enumerate(zip(sites, all_embeddings)):
-        # Convert Decimal to float for JSON serialization
-        payload = {
-            'id': str(site['id']),
-            'name': site['name'],
-            'type': site['type'],
-            'brand': site['brand'],
-            'city': site['city'],
-            'ward': site['ward'],
-            'area': site['area'],
-            'address': site['new_address'] or site['old_address'],
-            'lat': float(site['lat']) if site['lat'] else None,
-            'lng': float(site['lng']) if site['lng'] else None,
-            'rating': float(site['rating']) if site['rating'] else None,
-            'review_count': site['review_count'],
-            'phone_number': site['phone_number'],
-            'link_google': site['link_google'],
-            'link_web': site['link_web'],
-            'thumbnail_url': site['thumbnail_url'],
-            'place_id': site['place_id'],
-            'search_text': create_site_text(site)
-        }
-        
-        point = PointStruct(
-            id=idx,
-            vector=embedding.tolist(),
-            payload=payload
+    print(f"✓ Created collection '{collection_name}' with vector size {vector_size}")
+    
+    # Payload indexes for the filters applied inside Qdrant (geo radius, /api/search filters)
+    for field_name, field_schema in PAYLOAD_INDEXES.items():
+        qdrant_client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=field_schema,
         )
-        points.append(point)
+        print(f"✓ Created {field_schema.value} payload index on '{field_name}'")
+
+class Embedder:
+    """
+    Encodes texts in this process, or across a sentence-transformers multi-process pool
+    when workers > 1 and a call has more than `min_pool_texts` texts. Embeddings are
+    always returned in input order. With a `store`, only texts it has not seen before are encoded
+    """
+    
+    def __init__(self, model, workers=EMBED_WORKERS, batch_size=EMBED_BATCH_SIZE, store=None, min_pool_texts=0):
+        self.model = model
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.min_pool_texts = min_pool_texts
+        self.pool = None
+        self.store = store
+    
+    def _start_pool(self):
+        # Give each worker its share of the cores so the processes do not oversubscribe them
+        threads = os.environ.get('OMP_NUM_THREADS')
+        os.environ['OMP_NUM_THREADS'] = str(max(1, (os.cpu_count() or self.workers) // self.workers))
+        try:
+            self.pool = self.model.start_multi_process_pool(target_devices=['cpu'] * self.workers)
+        finally:
+            if threads is None:
+                del os.environ['OMP_NUM_THREADS']
+            else:
+                os.environ['OMP_NUM_THREADS'] = threads
+    
+    def encode(self, texts):
+        if self.store is None:
+            return self._encode(texts)
+        
+        vectors = self.store.get(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            new_texts = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = self._encode(new_texts)
+            self.store.put(new_texts, encoded)
+            by_text = dict(zip(new_texts, encoded))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+        return np.stack(vectors) if vectors else np.empty((0, self.model.get_sentence_embedding_dimension()))
     
-    # Upload in batches
-    print("\nUploading to Qdrant...")
+    def _encode(self, texts):
+        # Small inputs (e.g. an incremental sync) are not worth starting the pool for
+        if self.workers == 1 or len(texts) <= max(self.batch_size, self.min_pool_texts):
+            return self.model.encode(texts, batch_size=self.batch_size, show_progress_bar=False)
+        if self.pool is None:
+            self._start_pool()
+        # About one chunk per worker; the pool reassembles the chunks in input order
+        chunk_size = max(self.batch_size, math.ceil(len(texts) / self.workers))
+        return self.model.encode_multi_process(texts, self.pool, batch_size=self.batch_size, chunk_size=chunk_size)
+    
+    def close(self):
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+            self.pool = None
+        if self.store is not None:
+            self.store.close()
+
+def build_payload(site, text):
+    """Qdrant payload for a site (schema PAYLOAD_SCHEMA_VERSION)"""
+    # Convert Decimal to float for JSON serialization
+    lat = float(site['lat']) if site['lat'] else None
+    lng = float(site['lng']) if site['lng'] else None
+    return {
+        'schema_version': PAYLOAD_SCHEMA_VERSION,
+        'id': str(site['id']),
+        'name': site['name'],
+        'type': site['type'],
+        'brand': site['brand'],
+        'city': site['city'],
+        'address': site['new_address'] or site['old_address'],
+        'lat': lat,
+        'lng': lng,
+        # Qdrant geo point (indexed), only set when coordinates are known
+        'location': {'lat': lat, 'lon': lng} if lat is not None and lng is not None else None,
+        'rating': float(site['rating']) if site['rating'] else None,
+        'review_count': site['review_count'],
+        'phone_number': site['phone_number'],
+        'link_google': site['link_google'],
+        'link_web': site['link_web'],
+        'thumbnail_url': site['thumbnail_url'],
+        'search_text': text,
+        'content_hash': content_hash(text)
+    }
+
+def upsert_points(qdrant_client, points, collection_name=COLLECTION_NAME):
+    """Upload points in batches"""
     batch_size = 100
     
     for i in tqdm(range(0, len(points), batch_size), desc="Uploading"):
         batch_points = points[i:i + batch_size]
         qdrant_client.upsert(
-            collection_name=COLLECTION_NAME,
+            collection_name=collection_name,
             points=batch_points
         )
+
+def upload_to_qdrant(qdrant_client, embedder, collection_name, batches, total=None, upsert_workers=UPSERT_WORKERS):
+    """
+    Stream site batches into a new Qdrant collection: text building, embedding and
+    upserts run as overlapping stages. Returns (rows, max updated_at, stage stats)
+    """
+    setup_qdrant_collection(qdrant_client, collection_name, embedder.model.get_sentence_embedding_dimension())
+    
+    summary = {'rows': 0, 'watermark': None}
+    
+    def build_texts(sites):
+        updated = [site['updated_at'] for site in sites if site['updated_at']]
+        if updated:
+            summary['watermark'] = max([summary['watermark'] or updated[0]] + updated)
+        summary['rows'] += len(sites)
+        texts = [create_site_text(site) for site in sites]
+        return [(str(site['id']), text, build_payload(site, text)) for site, text in zip(sites, texts)]
+    
+    def embed(rows):
+        embeddings = embedder.encode([text for _, text, _ in rows])
+        # Points are keyed by site UUID so ids stay stable across imports and syncs
+        return [
+            PointStruct(id=site_id, vector=embedding.tolist(), payload=payload)
+            for (site_id, _, payload), embedding in zip(rows, embeddings)
+        ]
+    
+    def upsert(points):
+        qdrant_client.upsert(collection_name=collection_name, points=points)
+        progress.update(len(points))
+    
+    print(f"\nStreaming sites into '{collection_name}' "
+          f"(embedding workers: {embedder.workers}, upload workers: {upsert_workers})...")
+    progress = tqdm(total=total, desc="Importing", unit="site")
+    try:
+        stage_stats, wall_seconds = run_pipeline(
+            ('read', batches),
+            [('text', build_texts, 1), ('embed', embed, 1), ('upsert', upsert, upsert_workers)],
+            queue_size=PIPELINE_QUEUE_SIZE
+        )
+    finally:
+        progress.close()
     
-    print(f"✓ Uploaded {len(points)} points to Qdrant")
+    print(f"✓ Uploaded {summary['rows']} points in {wall_seconds:.1f}s "
+          f"({summary['rows'] / wall_seconds if wall_seconds else 0:.1f} rows/s overall)")
+    for stats in stage_stats:
+        print(f"  {stats}")
+    return summary['rows'], summary['watermark'], stage_stats
+
+def validate_collection(qdrant_client, collection_name, expected_count, model):
+    """Check a freshly built collection before it goes live; returns a list of problems"""
+    problems = []
+    points_count = qdrant_client.count(collection_name=collection_name, exact=True).count
+    if points_count != expected_count:
+        problems.append(f"expected {expected_count} points, found {points_count}")
+    
+    for query, embedding in zip(VALIDATION_QUERIES, model.encode(VALIDATION_QUERIES)):
+        results = qdrant_client.search(
+            collection_name=collection_name,
+            query_vector=embedding.tolist(),
+            limit=3,
+            with_payload=False,
+            with_vectors=False
+        )
+        if not results:
+            problems.append(f"no results for query '{query}'")
+    return problems
+
+def alias_target(qdrant_client):
+    """Collection the alias currently points to, or None"""
+    for alias in qdrant_client.get_aliases().aliases:
+        if alias.alias_name == COLLECTION_NAME:
+            return alias.collection_name
+    return None
+
+def switch_alias(qdrant_client, collection_name):
+    """Point the alias at `collection_name` in one atomic update"""
+    previous = alias_target(qdrant_client)
+    if previous is None and COLLECTION_NAME in [c.name for c in qdrant_client.get_collections().collections]:
+        # One-time migration from the unversioned collection: an alias cannot share
+        # its name with a collection, so the old one has to go first
+        print(f"Replacing legacy collection '{COLLECTION_NAME}' with an alias...")
+        qdrant_client.delete_collection(collection_name=COLLECTION_NAME)
+    
+    operations = []
+    if previous is not None:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=COLLECTION_NAME)))
+    operations.append(CreateAliasOperation(create_alias=CreateAlias(
+        collection_name=collection_name, alias_name=COLLECTION_NAME
+    )))
+    qdrant_client.update_collection_aliases(change_aliases_operations=operations)
+    print(f"✓ Alias '{COLLECTION_NAME}' -> '{collection_name}' (was {previous or 'unset'})")
+
+def garbage_collect_collections(qdrant_client, keep=COLLECTION_VERSIONS_TO_KEEP):
+    """Delete old versioned collections, keeping the newest `keep` and the live one"""
+    live = alias_target(qdrant_client)
+    versions = sorted(
+        (c.name for c in qdrant_client.get_collections().collections if c.name.startswith(f"{COLLECTION_NAME}_v")),
+        reverse=True
+    )
+    for name in versions[max(keep, 1):]:
+        if name != live:
+            qdrant_client.delete_collection(collection_name=name)
+            print(f"✓ Deleted old collection '{name}'")
+
+def fetch_stored_payloads(qdrant_client, ids):
+    """Stored payload per point id (missing points are absent)"""
+    payloads = {}
+    batch_size = 256
+    for i in range(0, len(ids), batch_size):
+        points = qdrant_client.retrieve(
+            collection_name=COLLECTION_NAME,
+            ids=ids[i:i + batch_size],
+            with_payload=True,
+            with_vectors=False
+        )
+        for point in points:
+            payloads[str(point.id)] = point.payload
+    return payloads
+
+def sync_to_qdrant(qdrant_client, embedder, watermark, reconcile=False):
+    """
+    Apply changes since `watermark` to the existing collection
+    Changed texts are re-embedded, payload-only changes are written with set_payload,
+    deactivated sites are deleted. Returns (new watermark, stats)
+    """
+    changed_since = watermark - timedelta(minutes=SYNC_OVERLAP_MINUTES)
+    print(f"\nFetching sites updated since {changed_since} (watermark {watermark})...")
+    sites = fetch_sites_from_postgres(changed_since=changed_since)
+    new_watermark = max([watermark] + [site['updated_at'] for site in sites if site['updated_at']])
+    
+    active = [site for site in sites if site['is_active']]
+    deleted_ids = [str(site['id']) for site in sites if not site['is_active']]
+    
+    payloads = {str(site['id']): build_payload(site, create_site_text(site)) for site in active}
+    stored = fetch_stored_payloads(qdrant_client, list(payloads))
+    
+    to_embed, payload_only = [], []
+    for site_id, payload in payloads.items():
+        previous = stored.get(site_id)
+        if previous is None or previous.get('content_hash') != payload['content_hash']:
+            to_embed.append(site_id)
+        elif previous != payload:
+            payload_only.append(site_id)
+    
+    if to_embed:
+        print(f"\nRe-embedding {len(to_embed)} new or changed sites...")
+        embeddings = embedder.encode([payloads[site_id]['search_text'] for site_id in to_embed])
+        upsert_points(qdrant_client, [
+            PointStruct(id=site_id, vector=embedding.tolist(), payload=payloads[site_id])
+            for site_id, embedding in zip(to_embed, embeddings)
+        ])
+        print(f"✓ Upserted {len(to_embed)} points")
+    
+    # Same text, vector still valid: refresh rating, links etc. without re-embedding
+    batch_size = 100
+    for i in range(0, len(payload_only), batch_size):
+        qdrant_client.batch_update_points(
+            collection_name=COLLECTION_NAME,
+            update_operations=[
+                OverwritePayloadOperation(overwrite_payload=SetPayload(payload=payloads[site_id], points=[site_id]))
+                for site_id in payload_only[i:i + batch_size]
+            ]
+        )
+    if payload_only:
+        print(f"✓ Updated payloads of {len(payload_only)} points")
+    
+    if reconcile:
+        # Sites hard-deleted from Postgres never show up as changed rows
+        print("\nReconciling point ids with active sites...")
+        active_ids = fetch_active_site_ids()
+        point_ids = []
+        offset = None
+        while True:
+            points, offset = qdrant_client.scroll(
+                collection_name=COLLECTION_NAME, limit=1000, offset=offset,
+                with_payload=False, with_vectors=False
+            )
+            point_ids.extend(str(point.id) for point in points)
+            if offset is None:
+                break
+        deleted_ids += [point_id for point_id in point_ids if point_id not in active_ids]
+    
+    deleted_ids = list(dict.fromkeys(deleted_ids))
+    if deleted_ids:
+        qdrant_client.delete(
+            collection_name=COLLECTION_NAME,
+            points_selector=PointIdsList(points=deleted_ids)
+        )
+        print(f"✓ Deleted {len(deleted_ids)} points of inactive sites")
+    
+    return new_watermark, {
+        'changed_rows': len(sites),
+        'embedded': len(to_embed),
+        'payload_updated': len(payload_only),
+        'unchanged': len(active) - len(to_embed) - len(payload_only),
+        'deleted': len(deleted_ids),
+    }
+
+def collection_exists(qdrant_client):
+    if alias_target(qdrant_client) is not None:
+        return True
+    return COLLECTION_NAME in [c.name for c in qdrant_client.get_collections().collections]
+
+def invalidate_api_search_cache():
+    """Ask the running API to drop cached search results for the old collection"""
+    if not API_URL or not SEARCH_ADMIN_TOKEN:
+        print("\nSkipping API search cache invalidation (API_URL / SEARCH_ADMIN_TOKEN not set)")
+        return
+    
+    request = urllib.request.Request(
+        f"{API_URL.rstrip('/')}/api/search/cache/invalidate",
+        method="POST",
+        headers={"X-Admin-Token": SEARCH_ADMIN_TOKEN}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            print(f"✓ Invalidated API search cache ({response.status})")
+    except Exception as e:
+        print(f"✗ Could not invalidate API search cache: {e}")
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Import sites from PostgreSQL into Qdrant")
+    parser.add_argument('--sync', action='store_true',
+                        help="Incremental sync of sites changed since the last run (full rebuild if never run)")
+    parser.add_argument('--reconcile', action='store_true',
+                        help="With --sync: also delete points whose site no longer exists or is inactive")
+    parser.add_argument('--embed-workers', type=int, default=EMBED_WORKERS,
+                        help="Embedding processes (default: IMPORT_EMBED_WORKERS=1; 0 = one per CPU core)")
+    parser.add_argument('--no-embedding-store', action='store_true',
+                        help="Embed every text instead of reusing stored vectors of unchanged texts")
+    parser.add_argument('--keep', type=int, default=COLLECTION_VERSIONS_TO_KEEP,
+                        help="Versioned collections to keep after a full rebuild (for rollback)")
+    args = parser.parse_args()
     
     print("=" * 60)
     print("CoSpa - Import to Qdrant Vector Database")
@@ -205,31 +584,92 @@ def main():
         print(f"✓ Connected to Qdrant. Existing collections: {len(collections.collections)}")
         
         # Load embedding model
-        print(f"\nLoading embedding model: {MODEL_NAME}...")
-        model = SentenceTransformer(MODEL_NAME)
+        print(f"\nLoading embedding model: {MODEL_NAME} (backend: {EMBEDDING_BACKEND})...")
+        model = load_embedding_model()
         print(f"✓ Model loaded. Embedding dimension: {model.get_sentence_embedding_dimension()}")
         
-        # Fetch sites from PostgreSQL
-        sites = fetch_sites_from_postgres()
+        watermark = get_sync_watermark() if args.sync else None
+        if args.sync and (watermark is None or not collection_exists(qdrant_client)):
+            print("\nNo previous sync found, running a full rebuild")
+            watermark = None
         
-        if not sites:
-            print("\n✗ No sites found in PostgreSQL")
-            sys.exit(1)
+        store = None
+        if EMBEDDING_STORE_ENABLED and not args.no_embedding_store:
+            try:
+                store = EmbeddingStore()
+            except StoreLockedError as e:
+                print(f"⚠ {e}; embedding every text this run")
+        if store is not None:
+            print(f"✓ Embedding store: {store.path} ({len(store)} vectors)")
+        # Rebuild batches are sized for the pool; a sync only uses it for large change sets
+        embedder = Embedder(model, workers=args.embed_workers, store=store,
+                            min_pool_texts=EMBED_POOL_MIN_TEXTS if watermark is not None else 0)
         
-        # Upload to Qdrant
-        upload_to_qdrant(qdrant_client, sites, model)
+        if watermark is not None:
+            try:
+                new_watermark, stats = sync_to_qdrant(qdrant_client, embedder, watermark, reconcile=args.reconcile)
+            finally:
+                embedder.close()
+        else:
+            total = count_active_sites()
+            if not total:
+                print("\n✗ No sites found in PostgreSQL")
+                sys.exit(1)
+            
+            # Build the new version next to the live one, validate it, then switch the alias
+            collection_name = new_collection_name()
+            # Batches big enough for every worker to get a full encode batch
+            batch_size = max(PIPELINE_BATCH_SIZE, embedder.workers * embedder.batch_size)
+            try:
+                rows, new_watermark, stage_stats = upload_to_qdrant(
+                    qdrant_client, embedder, collection_name, stream_sites_from_postgres(batch_size), total=total
+                )
+            except Exception:
+                # Never leave a half-built version behind for the next GC to keep
+                qdrant_client.delete_collection(collection_name=collection_name)
+                raise
+            finally:
+                embedder.close()
+            
+            problems = validate_collection(qdrant_client, collection_name, rows, model)
+            if problems:
+                print(f"\n✗ Validation of '{collection_name}' failed, alias left unchanged:")
+                for problem in problems:
+                    print(f"  - {problem}")
+                qdrant_client.delete_collection(collection_name=collection_name)
+                sys.exit(1)
+            print(f"✓ Validated '{collection_name}'")
+            
+            switch_alias(qdrant_client, collection_name)
+            garbage_collect_collections(qdrant_client, keep=args.keep)
+            stats = {'points': rows}
+            stats.update({f"{stage.name}_rows_per_sec": round(stage.rows_per_second, 1) for stage in stage_stats})
+        if store is not None:
+            store_stats = store.stats()
+            stats['embedding_store_hits'] = store_stats['hits']
+            stats['newly_embedded'] = store_stats['misses']
+            stats['embedding_store_hit_rate'] = store_stats['hit_rate']
         
         # Verify upload
         collection_info = qdrant_client.get_collection(collection_name=COLLECTION_NAME)
+        if new_watermark is not None:
+            save_sync_watermark(new_watermark, collection_info.points_count)
+        
         print("\n" + "=" * 60)
         print("Import Summary")
         print("=" * 60)
-        print(f"Collection: {COLLECTION_NAME}")
+        print(f"Mode: {'incremental sync' if watermark is not None else 'full rebuild'}")
+        for name, value in stats.items():
+            print(f"{name.replace('_', ' ').capitalize()}: {value}")
+        print(f"Collection: {COLLECTION_NAME} -> {alias_target(qdrant_client)}")
         print(f"Total points: {collection_info.points_count}")
         print(f"Vector size: {collection_info.config.params.vectors.size}")
+        print(f"Payload schema: v{PAYLOAD_SCHEMA_VERSION}")
         print("=" * 60)
         print("\n✓ Import completed successfully!")
         
+        invalidate_api_search_cache()
+        
         # Test search
         print("\nTesting search with query: 'coworking space Hanoi'...")
         test_query = "coworking space Hanoi"
@@ -238,7 +678,9 @@ def main():
         search_results = qdrant_client.search(
             collection_name=COLLECTION_NAME,
             query_vector=test_embedding.tolist(),
-            limit=3
+            limit=3,
+            with_payload=['name', 'type', 'address'],
+            with_vectors=False
         )
         
         print(f"\nTop 3 results:")
@@ -0,0 +1,16 @@
+-- Migration: Create vector sync state table
+-- Description: Watermark for incremental PostgreSQL -> Qdrant sync (db/import_to_qdrant.py --sync)
+
+CREATE TABLE IF NOT EXISTS vector_sync_state (
+    collection_name VARCHAR(255) PRIMARY KEY,
+    last_synced_at TIMESTAMP NOT NULL,
+    points_count INTEGER,
+    synced_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Incremental sync selects sites by updated_at
+CREATE INDEX IF NOT EXISTS idx_sites_updated_at ON sites(updated_at);
+
+-- Add comments
+COMMENT ON TABLE vector_sync_state IS 'Incremental sync watermark per Qdrant collection';
+COMMENT ON COLUMN vector_sync_state.last_synced_at IS 'Latest sites.updated_at already pushed to the collection';
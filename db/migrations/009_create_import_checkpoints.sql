@@ -0,0 +1,17 @@
+-- Migration: Create import checkpoints table
+-- Description: Progress of chunked CSV imports (db/site_loader.py) so an interrupted import resumes
+
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    file_hash CHAR(64) PRIMARY KEY,
+    file_name VARCHAR(500) NOT NULL,
+    byte_offset BIGINT NOT NULL DEFAULT 0,
+    row_num BIGINT NOT NULL DEFAULT 1,
+    rows_loaded BIGINT NOT NULL DEFAULT 0,
+    completed_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Add comments
+COMMENT ON TABLE import_checkpoints IS 'Last committed chunk of each CSV file, keyed by content hash';
+COMMENT ON COLUMN import_checkpoints.byte_offset IS 'File offset right after the last committed row';
+COMMENT ON COLUMN import_checkpoints.row_num IS 'CSV row number (header = 1) of the last committed row';
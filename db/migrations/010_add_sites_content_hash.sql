@@ -0,0 +1,8 @@
+-- Migration: Add content hash to sites
+-- Description: Hash of the CSV fields the import upserts, so re-imports skip unchanged rows
+-- (db/site_loader.py) and sites.updated_at only moves when a site really changed
+
+ALTER TABLE sites ADD COLUMN IF NOT EXISTS content_hash CHAR(32);
+
+-- Add comments
+COMMENT ON COLUMN sites.content_hash IS 'md5 of the imported fields (site_loader.UPSERT_COLUMNS); NULL until the next import';
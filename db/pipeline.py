@@ -0,0 +1,139 @@
+"""
+Threaded batch pipeline: a source and a chain of stages connected by bounded queues
+Stages overlap (e.g. embedding the next batch while the previous one uploads) and the
+bounded queues apply backpressure, so memory stays flat however many rows stream through
+"""
+
+import queue
+import threading
+import time
+
+_DONE = object()
+
+class StageStats:
+    """Rows handled and time spent working (not waiting on queues) by one stage"""
+
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, rows, seconds):
+        with self._lock:
+            self.rows += rows
+            self.busy_seconds += seconds
+
+    @property
+    def rows_per_second(self):
+        # Busy time is summed over workers, so scale back to one stage's throughput
+        busy = self.busy_seconds / self.workers
+        return self.rows / busy if busy > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.name:<10} {self.rows:>9} rows  {self.busy_seconds:8.1f}s busy  "
+                f"{self.rows_per_second:10.1f} rows/s  (x{self.workers})")
+
+class _Aborted(Exception):
+    pass
+
+def run_pipeline(source, stages, queue_size=8):
+    """
+    source: (name, iterable of batches)
+    stages: [(name, fn, workers)]; fn(batch) returns the batch for the next stage (the
+    last stage's return value is dropped). Batches must support len() for row counts
+    Returns (stats per stage, wall seconds). The first exception raised by any stage
+    stops the pipeline and is re-raised here
+    """
+    stop = threading.Event()
+    errors = []
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise _Aborted()
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        raise _Aborted()
+
+    def fail(e):
+        if not isinstance(e, _Aborted):
+            errors.append(e)
+        stop.set()
+
+    source_name, batches = source
+    source_stats = StageStats(source_name)
+
+    def run_source():
+        iterator = iter(batches)
+        try:
+            while True:
+                started = time.perf_counter()
+                batch = next(iterator, _DONE)
+                if batch is _DONE:
+                    break
+                source_stats.add(len(batch), time.perf_counter() - started)
+                put(queues[0], batch)
+            put(queues[0], _DONE)
+        except BaseException as e:
+            fail(e)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    stage_stats = []
+    threads = [threading.Thread(target=run_source, name=source_name, daemon=True)]
+    for index, (name, fn, workers) in enumerate(stages):
+        stats = StageStats(name, workers)
+        stage_stats.append(stats)
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(queues) else None
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def run_worker(fn=fn, stats=stats, inbox=inbox, outbox=outbox, remaining=remaining, lock=lock):
+            try:
+                while True:
+                    batch = get(inbox)
+                    if batch is _DONE:
+                        # Let sibling workers see the end too; the last one passes it on
+                        put(inbox, _DONE)
+                        with lock:
+                            remaining[0] -= 1
+                            last = remaining[0] == 0
+                        if last and outbox is not None:
+                            put(outbox, _DONE)
+                        return
+                    started = time.perf_counter()
+                    result = fn(batch)
+                    stats.add(len(batch), time.perf_counter() - started)
+                    if outbox is not None:
+                        put(outbox, result)
+            except BaseException as e:
+                fail(e)
+
+        for worker in range(workers):
+            threads.append(threading.Thread(target=run_worker, name=f"{name}-{worker}", daemon=True))
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started
+
+    if errors:
+        raise errors[0]
+    return [source_stats] + stage_stats, wall_seconds
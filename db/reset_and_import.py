@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 """
 Script to drop existing table and reimport data
+Import checkpoints are cleared too, so the next import loads every file again,
+and so is the Qdrant sync watermark, so the next --sync does a full rebuild
 """
 
 import psycopg
@@ -50,8 +52,19 @@ def main():
         # Drop existing table
         print("Dropping existing sites table...")
         cursor.execute("DROP TABLE IF EXISTS sites CASCADE;")
+        
+        # Checkpoints would mark every file as already imported into the dropped table
+        cursor.execute("SELECT to_regclass('import_checkpoints')")
+        if cursor.fetchone()[0] is not None:
+            cursor.execute("TRUNCATE import_checkpoints;")
+        
+        # The reimported sites get fresh ids, so an incremental --sync against the old
+        # watermark would leave every old point in the collection
+        cursor.execute("SELECT to_regclass('vector_sync_state')")
+        if cursor.fetchone()[0] is not None:
+            cursor.execute("TRUNCATE vector_sync_state;")
         conn.commit()
-        print("✓ Table dropped successfully\n")
+        print("✓ Table dropped, import checkpoints and sync watermark cleared successfully\n")
         
         cursor.close()
         conn.close()
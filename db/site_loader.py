@@ -0,0 +1,304 @@
+"""
+Bulk loader for site CSVs
+Parsed rows are streamed with binary COPY into the unlogged `sites_staging` table,
+then merged into `sites` with one INSERT ... SELECT ... ON CONFLICT statement,
+instead of one INSERT round trip per row.
+Files are loaded in chunks, each committed together with the file's row in
+`import_checkpoints`, so an interrupted import resumes after the last committed chunk.
+A file that was imported completely is imported again; content_hash keeps that cheap
+"""
+
+import csv
+from decimal import Decimal
+import hashlib
+from itertools import islice
+import os
+import time
+import uuid
+
+STAGING_TABLE = 'sites_staging'
+
+# Rows per committed chunk; memory use is bounded by one chunk whatever the file size
+IMPORT_CHUNK_ROWS = int(os.getenv('IMPORT_CHUNK_ROWS', '50000'))
+
+# `sites` columns filled from the CSV, in COPY order
+SITE_COLUMNS = [
+    'name', 'type', 'brand', 'old_address', 'new_address', 'num_address',
+    'ward', 'district', 'city', 'area', 'link_google', 'link_web', 'thumbnail_url',
+    'lat', 'lng', 'note', 'phone_number', 'rating', 'review_count',
+    'query_source', 'place_id', 'data_id', 'cid'
+]
+
+# Columns an import overwrites on existing sites; their hash is sites.content_hash
+UPSERT_COLUMNS = ['name', 'type', 'brand', 'rating', 'review_count']
+
+# Binary COPY needs the Postgres type of every column
+COPY_TYPES = ['uuid', 'int8'] + [
+    'numeric' if column in ('lat', 'lng', 'rating') else 'int4' if column == 'review_count' else 'text'
+    for column in SITE_COLUMNS
+]
+
+def parse_decimal(value):
+    """Parse decimal value from string, handling empty values"""
+    if not value or value.strip() == '':
+        return None
+    try:
+        # Replace comma with dot for decimal separator
+        value = value.replace(',', '.')
+        return Decimal(value)
+    except:
+        return None
+
+def parse_integer(value):
+    """Parse integer value from string, handling empty values"""
+    if not value or value.strip() == '':
+        return None
+    try:
+        return int(value)
+    except:
+        return None
+
+def clean_string(value):
+    """Clean string value, return None for empty strings"""
+    if not value or value.strip() == '':
+        return None
+    return value.strip()
+
+def parse_site_row(row):
+    """Map a CSV row to a tuple in SITE_COLUMNS order"""
+    # Handle BOM in first column name
+    name_col = '\ufeffTên địa điểm' if '\ufeffTên địa điểm' in row else 'Tên địa điểm'
+    return (
+        clean_string(row.get(name_col)),
+        clean_string(row.get('Loại hình')),
+        clean_string(row.get('Thương hiệu/Chuỗi')),
+        clean_string(row.get('Địa chỉ cũ')),
+        clean_string(row.get('Địa chỉ mới')),
+        clean_string(row.get('Số nhà / Đường')),
+        clean_string(row.get('Phường')),
+        None,  # district - not in CSV, will extract from ward if needed
+        clean_string(row.get('Tỉnh/Thành phố')),
+        clean_string(row.get('Khu vực')),
+        clean_string(row.get('Link Google Maps')),
+        clean_string(row.get('Website/MXH')),
+        clean_string(row.get('Ảnh (URL)')),
+        parse_decimal(row.get('Vĩ độ')),
+        parse_decimal(row.get('Kinh độ')),
+        clean_string(row.get('Ghi chú')),
+        clean_string(row.get('SĐT')),
+        parse_decimal(row.get('Điểm rating')),
+        parse_integer(row.get('Số review')),
+        clean_string(row.get('Query nguồn')),
+        clean_string(row.get('Place ID')),
+        clean_string(row.get('Data ID')),
+        clean_string(row.get('CID'))
+    )
+
+def file_hash(path):
+    """SHA-256 of the file content; a checkpoint only applies to the exact same file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_csv_sites(csv_file_path, stats, offset=0, row_num=1):
+    """
+    Yield (row number, site tuple, byte offset after the row) lazily
+    offset/row_num: resume right after a checkpointed row (row 1 is the header).
+    Skipped rows are counted in stats['skipped']
+    """
+    with open(csv_file_path, 'rb') as file:
+        position = 0
+
+        def lines():
+            # The csv module pulls exactly the lines of one record at a time, so
+            # `position` is the offset right after the record just parsed
+            nonlocal position
+            for line in file:
+                position += len(line)
+                yield line.decode('utf-8')
+
+        # Read CSV with semicolon delimiter
+        csv_reader = csv.reader(lines(), delimiter=';')
+        fieldnames = next(csv_reader, None)
+        if fieldnames is None:
+            return
+        if offset:
+            file.seek(offset)
+            position = offset
+
+        for values in csv_reader:
+            if not values:
+                continue
+            row_num += 1
+            try:
+                yield row_num, parse_site_row(dict(zip(fieldnames, values))), position
+            except Exception as e:
+                print(f"⚠ Warning: Skipped row {row_num} due to error: {e}")
+                stats['skipped'] += 1
+
+def ensure_staging_table(cursor):
+    """Unlogged (no WAL) scratch table; concurrent loads are told apart by load_id"""
+    columns = ",\n            ".join(
+        f"{column} {'NUMERIC' if kind == 'numeric' else 'INTEGER' if kind == 'int4' else 'TEXT'}"
+        for column, kind in zip(SITE_COLUMNS, COPY_TYPES[2:])
+    )
+    cursor.execute(f"""
+        CREATE UNLOGGED TABLE IF NOT EXISTS {STAGING_TABLE} (
+            load_id UUID NOT NULL,
+            row_num BIGINT NOT NULL,
+            {columns}
+        );
+        CREATE INDEX IF NOT EXISTS idx_{STAGING_TABLE}_load_id ON {STAGING_TABLE}(load_id);
+    """)
+
+def copy_to_staging(cursor, load_id, rows):
+    """Stream rows from read_csv_sites into the staging table; returns rows copied"""
+    copied = 0
+    columns = ", ".join(['load_id', 'row_num'] + SITE_COLUMNS)
+    with cursor.copy(f"COPY {STAGING_TABLE} ({columns}) FROM STDIN (FORMAT BINARY)") as copy:
+        copy.set_types(COPY_TYPES)
+        for row_num, site, _ in rows:
+            copy.write_row((load_id, row_num) + site)
+            copied += 1
+    return copied
+
+def merge_staging(cursor, load_ids):
+    """
+    Upsert staged loads into sites in one statement
+    Returns (inserted, updated, unchanged, deduplicated); the four add up to the staged rows
+    DISTINCT ON keeps one row per place_id (ON CONFLICT cannot touch a row twice): the
+    last row of the last load in `load_ids`, as if the files were imported in that order.
+    The rows it drops are counted as deduplicated.
+    Rows without a place_id are all kept, as before. Existing sites are only rewritten
+    (and updated_at bumped) when the hash of UPSERT_COLUMNS changed
+    """
+    columns = ", ".join(SITE_COLUMNS)
+    updates = ",\n                ".join(f"{column} = EXCLUDED.{column}" for column in UPSERT_COLUMNS)
+    load_ids = list(load_ids)
+    cursor.execute(f"""
+        WITH source AS (
+            SELECT DISTINCT ON (place_id, CASE WHEN place_id IS NULL THEN (load_id, row_num) END)
+                {columns}, md5(ROW({", ".join(UPSERT_COLUMNS)})::text) AS content_hash
+            FROM {STAGING_TABLE}
+            WHERE load_id = ANY(%s)
+            ORDER BY place_id, CASE WHEN place_id IS NULL THEN (load_id, row_num) END,
+                     array_position(%s::uuid[], load_id) DESC, row_num DESC
+        ), merged AS (
+            INSERT INTO sites ({columns}, content_hash)
+            SELECT {columns}, content_hash FROM source
+            ON CONFLICT (place_id) DO UPDATE SET
+                {updates},
+                content_hash = EXCLUDED.content_hash,
+                updated_at = NOW()
+            WHERE sites.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT
+            COUNT(*) FILTER (WHERE inserted),
+            COUNT(*) FILTER (WHERE NOT inserted),
+            (SELECT COUNT(*) FROM source) - COUNT(*),
+            (SELECT COUNT(*) FROM {STAGING_TABLE} WHERE load_id = ANY(%s)) - (SELECT COUNT(*) FROM source)
+        FROM merged
+    """, (load_ids, load_ids, load_ids))
+    inserted, updated, unchanged, deduplicated = cursor.fetchone()
+    discard_staging(cursor, load_ids)
+    return inserted, updated, unchanged, deduplicated
+
+def discard_staging(cursor, load_ids):
+    cursor.execute(f"DELETE FROM {STAGING_TABLE} WHERE load_id = ANY(%s)", (list(load_ids),))
+
+def stage_csv_file(cursor, csv_file_path, load_id):
+    """
+    COPY a whole CSV into staging under `load_id` (no chunking; used by parallel imports,
+    which merge all files at once and checkpoint whole files)
+    Returns a dict with rows, skipped, copy_seconds and the last row's row_num/byte_offset
+    """
+    stats = {'rows': 0, 'skipped': 0, 'row_num': 1, 'byte_offset': 0}
+
+    def rows():
+        for row in read_csv_sites(csv_file_path, stats):
+            stats['row_num'], stats['byte_offset'] = row[0], row[2]
+            yield row
+
+    started = time.perf_counter()
+    stats['rows'] = copy_to_staging(cursor, load_id, rows())
+    stats['copy_seconds'] = round(time.perf_counter() - started, 3)
+    return stats
+
+def get_checkpoint(cursor, digest):
+    cursor.execute("""
+        SELECT byte_offset, row_num, rows_loaded, completed_at
+        FROM import_checkpoints WHERE file_hash = %s
+    """, (digest,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip(['byte_offset', 'row_num', 'rows_loaded', 'completed_at'], row))
+
+def save_checkpoint(cursor, digest, file_name, byte_offset, row_num, rows_loaded, completed):
+    cursor.execute("""
+        INSERT INTO import_checkpoints (file_hash, file_name, byte_offset, row_num, rows_loaded, completed_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, CASE WHEN %s THEN NOW() END, NOW())
+        ON CONFLICT (file_hash) DO UPDATE SET
+            file_name = EXCLUDED.file_name,
+            byte_offset = EXCLUDED.byte_offset,
+            row_num = EXCLUDED.row_num,
+            rows_loaded = EXCLUDED.rows_loaded,
+            completed_at = EXCLUDED.completed_at,
+            updated_at = NOW()
+    """, (digest, file_name, byte_offset, row_num, rows_loaded, completed))
+
+def load_csv_file(conn, csv_file_path, chunk_rows=IMPORT_CHUNK_ROWS, restart=False):
+    """
+    COPY a CSV into staging and merge it into sites, committing every `chunk_rows` rows
+    together with the file's checkpoint. Resumes an interrupted load of the same file
+    unless `restart`; a completed file is read again from the start.
+    Returns a dict with rows, skipped, inserted, updated, unchanged, deduplicated, timings and resume info
+    """
+    stats = {
+        'rows': 0, 'skipped': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'deduplicated': 0,
+        'copy_seconds': 0.0, 'merge_seconds': 0.0, 'resumed_from_row': None,
+    }
+    digest = file_hash(csv_file_path)
+    file_name = os.path.basename(csv_file_path)
+
+    with conn.cursor() as cursor:
+        ensure_staging_table(cursor)
+        checkpoint = None if restart else get_checkpoint(cursor, digest)
+    conn.commit()
+
+    offset, row_num, rows_loaded = 0, 1, 0
+    if checkpoint and not checkpoint['completed_at']:
+        offset, row_num, rows_loaded = checkpoint['byte_offset'], checkpoint['row_num'], checkpoint['rows_loaded']
+        stats['resumed_from_row'] = row_num + 1
+
+    rows = read_csv_sites(csv_file_path, stats, offset, row_num)
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        with conn.cursor() as cursor:
+            if chunk:
+                load_id = uuid.uuid4()
+                started = time.perf_counter()
+                copy_to_staging(cursor, load_id, chunk)
+                copied = time.perf_counter()
+                inserted, updated, unchanged, deduplicated = merge_staging(cursor, [load_id])
+                stats['copy_seconds'] += copied - started
+                stats['merge_seconds'] += time.perf_counter() - copied
+                stats['rows'] += len(chunk)
+                stats['inserted'] += inserted
+                stats['updated'] += updated
+                stats['unchanged'] += unchanged
+                stats['deduplicated'] += deduplicated
+                row_num, offset = chunk[-1][0], chunk[-1][2]
+                rows_loaded += len(chunk)
+            done = len(chunk) < chunk_rows
+            save_checkpoint(cursor, digest, file_name, offset, row_num, rows_loaded, done)
+        conn.commit()
+        if done:
+            break
+
+    stats['copy_seconds'] = round(stats['copy_seconds'], 3)
+    stats['merge_seconds'] = round(stats['merge_seconds'], 3)
+    return stats
@@ -0,0 +1,125 @@
+"""
+Embedding store tests
+Run from db/: python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import embedding_store
+from embedding_store import EmbeddingStore, StoreLockedError
+
+KEY = 'test-model@torch'
+
+
+def vectors_for(texts, dimension=4):
+    """Deterministic vector per text"""
+    return np.array([[float(len(text)), float(sum(map(ord, text)))] + [float(i)] * (dimension - 2)
+                     for i, text in enumerate(texts)], dtype=np.float32)
+
+
+class EmbeddingStoreTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+
+    def open(self):
+        store = EmbeddingStore(self.root, key=KEY)
+        self.addCleanup(store.close)
+        return store
+
+    def test_put_get_round_trip_across_reopen(self):
+        texts = ['cafe a', 'cafe b', 'cafe c']
+        store = self.open()
+        store.put(texts + ['cafe a'], np.vstack([vectors_for(texts), vectors_for(['cafe a'])]))
+        self.assertEqual(len(store), 3)
+        store.close()
+
+        store = self.open()
+        got = store.get(texts + ['unknown'])
+        for vector, expected in zip(got, vectors_for(texts)):
+            np.testing.assert_array_equal(vector, expected)
+        self.assertIsNone(got[3])
+        self.assertEqual(store.stats()['hits'], 3)
+        self.assertEqual(store.stats()['misses'], 1)
+
+    def test_growth_keeps_earlier_rows(self):
+        texts = [f'site {i}' for i in range(embedding_store.MIN_CAPACITY + 100)]
+        store = self.open()
+        store.put(texts[:10], vectors_for(texts[:10]))
+        store.put(texts[10:], vectors_for(texts[10:]))
+        self.assertGreater(len(store._vectors), embedding_store.MIN_CAPACITY)
+        store.close()
+
+        store = self.open()
+        np.testing.assert_array_equal(np.vstack(store.get(texts[:10])), vectors_for(texts[:10]))
+        np.testing.assert_array_equal(store.get([texts[-1]])[0], vectors_for(texts[10:])[-1])
+
+    def test_unflushed_rows_are_lost_not_corrupted(self):
+        with mock.patch.object(embedding_store, 'FLUSH_EVERY', 3):
+            store = self.open()
+            store.put(['a', 'b', 'c'], vectors_for(['a', 'b', 'c']))
+            store.put(['d'], vectors_for(['d']))
+
+        # Simulate a crash: drop the lock without close() flushing 'd'
+        store._lock_file.close()
+        store._lock_file = None
+
+        store = self.open()
+        self.assertEqual(len(store), 3)
+        self.assertIsNone(store.get(['d'])[0])
+        np.testing.assert_array_equal(np.vstack(store.get(['a', 'b', 'c'])), vectors_for(['a', 'b', 'c']))
+
+    def test_dimension_mismatch_is_rejected(self):
+        store = self.open()
+        store.put(['a'], vectors_for(['a'], dimension=4))
+        with self.assertRaises(ValueError):
+            store.put(['b'], vectors_for(['b'], dimension=8))
+
+    def test_second_open_is_locked_out(self):
+        store = self.open()
+        with self.assertRaises(StoreLockedError):
+            EmbeddingStore(self.root, key=KEY)
+        store.close()
+        self.open()
+
+    def test_compact_keeps_only_listed_texts(self):
+        texts = ['a', 'b', 'c', 'd']
+        store = self.open()
+        store.put(texts, vectors_for(texts))
+        self.assertEqual(store.compact(['d', 'b', 'zzz']), 2)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get(['a', 'c']), [None, None])
+        expected = vectors_for(texts)
+        np.testing.assert_array_equal(np.vstack(store.get(['b', 'd'])), expected[[1, 3]])
+
+        # Rows put after a compaction do not overwrite kept ones
+        store.put(['e'], vectors_for(['e']))
+        store.close()
+        store = self.open()
+        np.testing.assert_array_equal(np.vstack(store.get(['b', 'd'])), expected[[1, 3]])
+        np.testing.assert_array_equal(store.get(['e'])[0], vectors_for(['e'])[0])
+
+    def test_open_finishes_an_interrupted_compaction(self):
+        texts = ['a', 'b']
+        store = self.open()
+        store.put(texts, vectors_for(texts))
+        store.close()
+
+        # Crash between compact()'s renames: the store moved to .old, .compact not yet in place
+        path = store.path
+        os.rename(path, path.with_name(path.name + '.compact'))
+        path.with_name(path.name + '.old').mkdir()
+
+        store = self.open()
+        np.testing.assert_array_equal(np.vstack(store.get(texts)), vectors_for(texts))
+        self.assertFalse(path.with_name(path.name + '.compact').exists())
+        self.assertFalse(path.with_name(path.name + '.old').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Threaded pipeline tests
+Run from db/: python -m unittest discover tests
+"""
+import threading
+import unittest
+
+from pipeline import run_pipeline
+
+
+class RunPipelineTest(unittest.TestCase):
+    def test_every_batch_reaches_the_last_stage(self):
+        batches = [[i] * (i + 1) for i in range(20)]
+        received = []
+        lock = threading.Lock()
+
+        def collect(batch):
+            with lock:
+                received.append(batch)
+
+        stats, wall_seconds = run_pipeline(
+            ('read', batches),
+            [('double', lambda batch: [value * 2 for value in batch], 3), ('collect', collect, 2)],
+            queue_size=2,
+        )
+        # Several workers per stage: every batch arrives once, in any order
+        self.assertEqual(sorted(received), sorted([value * 2 for value in batch] for batch in batches))
+        rows = sum(map(len, batches))
+        self.assertEqual([stage.rows for stage in stats], [rows, rows, rows])
+        self.assertEqual([stage.name for stage in stats], ['read', 'double', 'collect'])
+        self.assertGreaterEqual(wall_seconds, 0)
+
+    def test_stage_error_stops_the_pipeline_and_is_raised(self):
+        consumed = []
+
+        def source():
+            for i in range(10000):
+                consumed.append(i)
+                yield [i]
+
+        def explode(batch):
+            if batch[0] == 3:
+                raise ValueError("bad batch")
+            return batch
+
+        with self.assertRaises(ValueError):
+            run_pipeline(('read', source()), [('check', explode, 2), ('sink', lambda batch: None, 1)], queue_size=2)
+        # The bounded queues stop the source long before it runs dry
+        self.assertLess(len(consumed), 10000)
+
+    def test_source_error_is_raised(self):
+        def source():
+            yield [1]
+            raise OSError("read failed")
+
+        with self.assertRaises(OSError):
+            run_pipeline(('read', source()), [('sink', lambda batch: None, 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
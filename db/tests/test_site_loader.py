@@ -0,0 +1,301 @@
+"""
+CSV loader tests (no database: cursors and connections are stand-ins)
+Run from db/: python -m unittest discover tests
+"""
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import os
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+import uuid
+
+# import_all reads its connection settings at import time
+os.environ.setdefault('POSTGRES_PORT', '5432')
+
+import import_all
+import site_loader
+from site_loader import COPY_TYPES, SITE_COLUMNS
+
+HEADER = ['\ufeffTên địa điểm', 'Loại hình', 'Điểm rating', 'Số review', 'Vĩ độ', 'Ghi chú', 'Place ID']
+
+
+def write_csv(directory, name, lines):
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(';'.join(HEADER) + '\r\n')
+        for line in lines:
+            f.write(line + '\r\n')
+    return path
+
+
+class FakeCopy:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_types(self, types):
+        self.cursor.types = types
+
+    def write_row(self, row):
+        self.cursor.rows.append(row)
+
+
+class FakeCursor:
+    """Records what copy_to_staging writes"""
+
+    def __init__(self):
+        self.rows = []
+        self.types = None
+        self.statement = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy(self, statement):
+        self.statement = statement
+        return FakeCopy(self)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class ParseSiteRowTest(unittest.TestCase):
+    def test_bom_header_decimal_comma_and_blanks(self):
+        site = site_loader.parse_site_row({
+            '\ufeffTên địa điểm': ' Cộng Cà Phê ', 'Loại hình': 'Cafe', 'Vĩ độ': '21,0285',
+            'Điểm rating': '4,5', 'Số review': '1.2k', 'Thương hiệu/Chuỗi': '  ', 'Place ID': 'ChIJ1',
+        })
+        row = dict(zip(SITE_COLUMNS, site))
+        self.assertEqual(row['name'], 'Cộng Cà Phê')
+        self.assertEqual(row['lat'], Decimal('21.0285'))
+        self.assertEqual(row['rating'], Decimal('4.5'))
+        self.assertIsNone(row['review_count'])
+        self.assertIsNone(row['brand'])
+        self.assertEqual(row['place_id'], 'ChIJ1')
+
+
+class CopyToStagingTest(unittest.TestCase):
+    def test_rows_are_written_in_copy_type_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_csv(tmp, 'a.csv', ['Góc Cafe;Cafe;4,2;10;21,03;;ChIJ1', 'Phố Trà;Quán trà sữa;;;;;ChIJ2'])
+            cursor = FakeCursor()
+            load_id = uuid.uuid4()
+            copied = site_loader.copy_to_staging(cursor, load_id, site_loader.read_csv_sites(path, {'skipped': 0}))
+
+        self.assertEqual(copied, 2)
+        self.assertEqual(cursor.types, COPY_TYPES)
+        self.assertIn('FORMAT BINARY', cursor.statement)
+        self.assertTrue(all(len(row) == len(COPY_TYPES) for row in cursor.rows))
+        self.assertEqual([row[:2] for row in cursor.rows], [(load_id, 2), (load_id, 3)])
+        self.assertEqual(dict(zip(SITE_COLUMNS, cursor.rows[0][2:]))['review_count'], 10)
+
+
+class StageCsvFileTest(unittest.TestCase):
+    def test_stats_point_past_the_last_row(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_csv(tmp, 'a.csv', ['Góc Cafe;Cafe;;;;;ChIJ1', '', 'Phố Trà;Cafe;;;;"dòng 1\ndòng 2";ChIJ2'])
+            cursor = FakeCursor()
+            stats = site_loader.stage_csv_file(cursor, path, uuid.uuid4())
+            size = os.path.getsize(path)
+
+        self.assertEqual(stats['rows'], 2)
+        self.assertEqual(stats['skipped'], 0)
+        self.assertEqual(stats['row_num'], 3)
+        self.assertEqual(stats['byte_offset'], size)
+        self.assertEqual(dict(zip(SITE_COLUMNS, cursor.rows[1][2:]))['note'], 'dòng 1\ndòng 2')
+
+
+class ImportParallelTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # The largest file is staged first; the merge must still follow file order
+        self.files = [Path(write_csv(tmp.name, f'{name}.csv', ['Góc Cafe;Cafe;;;;;ChIJ1'] * rows))
+                      for name, rows in [('a', 1), ('b', 30), ('c', 5)]]
+        self.load_ids = {str(path): uuid.uuid4() for path in self.files}
+        self.discarded = []
+        self.merged = []
+        self.checkpoints = []
+
+        def stage(path):
+            return self.load_ids[path], {'rows': 1, 'skipped': 0, 'copy_seconds': 0.0, 'row_num': 2, 'byte_offset': 10}
+
+        patches = [
+            mock.patch('builtins.print'),
+            mock.patch.object(import_all, 'ProcessPoolExecutor', ThreadPoolExecutor),
+            mock.patch.object(import_all, 'stage_file_worker', stage),
+            mock.patch.object(import_all, 'ensure_staging_table', lambda cursor: None),
+            mock.patch.object(import_all, 'discard_staging', lambda cursor, ids: self.discarded.extend(ids)),
+            mock.patch.object(import_all, 'save_checkpoint', lambda cursor, *args, **kwargs: self.checkpoints.append(args)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_loads_are_merged_in_file_order(self):
+        def merge(cursor, load_ids):
+            self.merged.append(list(load_ids))
+            return 3, 0, 0, 0
+
+        with mock.patch.object(import_all, 'merge_staging', merge):
+            file_stats, merged, _ = import_all.import_parallel(FakeConnection(), self.files, jobs=3)
+
+        self.assertEqual(self.merged, [[self.load_ids[str(path)] for path in self.files]])
+        self.assertEqual(merged, (3, 0, 0, 0))
+        self.assertEqual(set(file_stats), set(self.files))
+        self.assertEqual(len(self.checkpoints), 3)
+
+    def test_failed_merge_discards_every_staged_load(self):
+        def merge(cursor, load_ids):
+            raise RuntimeError("merge failed")
+
+        conn = FakeConnection()
+        with mock.patch.object(import_all, 'merge_staging', merge):
+            with self.assertRaises(RuntimeError):
+                import_all.import_parallel(conn, self.files, jobs=3)
+
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertEqual(sorted(self.discarded), sorted(self.load_ids.values()))
+        self.assertEqual(self.checkpoints, [])
+
+    def test_failed_worker_discards_the_other_loads(self):
+        def stage(path):
+            if path.endswith('b.csv'):
+                raise OSError("connection lost")
+            return self.load_ids[path], {'rows': 1, 'skipped': 0, 'copy_seconds': 0.0}
+
+        with mock.patch.object(import_all, 'stage_file_worker', stage), \
+                mock.patch.object(import_all, 'merge_staging') as merge:
+            with self.assertRaises(RuntimeError):
+                import_all.import_parallel(FakeConnection(), self.files, jobs=3)
+
+        merge.assert_not_called()
+        self.assertEqual(sorted(self.discarded), sorted(self.load_ids[str(path)] for path in self.files[::2]))
+
+
+class ReadCsvSitesResumeTest(unittest.TestCase):
+    def test_resuming_at_any_offset_yields_the_remaining_rows(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_csv(tmp, 'a.csv', [
+                'Góc Cafe;Cafe;4,2;10;21,03;;ChIJ1',
+                'Nhà Mộc;Cafe;;;;"Không gian xanh\nphù hợp; làm việc nhóm";ChIJ2',
+                '',
+                'Cộng Cà Phê;Cafe;4,5;;;;ChIJ3',
+                'Phúc Long;Quán trà sữa;;;;"""Trà"" ngon";ChIJ4',
+            ])
+            rows = list(site_loader.read_csv_sites(path, {'skipped': 0}))
+            self.assertEqual([row[0] for row in rows], [2, 3, 4, 5])
+            self.assertEqual(rows[-1][2], os.path.getsize(path))
+
+            for index, (row_num, _, offset) in enumerate(rows):
+                resumed = list(site_loader.read_csv_sites(path, {'skipped': 0}, offset, row_num))
+                self.assertEqual(resumed, rows[index + 1:])
+
+
+class LoadCsvFileResumeTest(unittest.TestCase):
+    """Chunks and checkpoints with the staging SQL replaced by in-memory stand-ins"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = write_csv(tmp.name, 'a.csv', [f'Site {i};Cafe;;;;;ChIJ{i}' for i in range(7)])
+        self.staged = {}
+        self.merged_rows = []
+        self.fail_on_merge = None
+        # Checkpoint as written in the open transaction, and as committed
+        self.pending = None
+        self.committed = None
+
+        def copy(cursor, load_id, rows):
+            self.staged[load_id] = [row[0] for row in rows]
+            return len(self.staged[load_id])
+
+        def merge(cursor, load_ids):
+            rows = [row_num for load_id in load_ids for row_num in self.staged.pop(load_id)]
+            if self.fail_on_merge in rows:
+                raise RuntimeError("merge failed")
+            self.merged_rows.append(rows)
+            return len(rows), 0, 0, 0
+
+        def save(cursor, digest, file_name, byte_offset, row_num, rows_loaded, completed):
+            self.pending = {'byte_offset': byte_offset, 'row_num': row_num, 'rows_loaded': rows_loaded,
+                            'completed_at': 'now' if completed else None}
+
+        conn = FakeConnection()
+
+        def commit():
+            conn.commits += 1
+            self.committed = self.pending
+        conn.commit = commit
+        self.conn = conn
+
+        patches = [
+            mock.patch.object(site_loader, 'ensure_staging_table', lambda cursor: None),
+            mock.patch.object(site_loader, 'get_checkpoint', lambda cursor, digest: self.committed),
+            mock.patch.object(site_loader, 'copy_to_staging', copy),
+            mock.patch.object(site_loader, 'merge_staging', merge),
+            mock.patch.object(site_loader, 'save_checkpoint', save),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_interrupted_load_resumes_after_the_last_committed_chunk(self):
+        self.fail_on_merge = 6
+        with self.assertRaises(RuntimeError):
+            site_loader.load_csv_file(self.conn, self.path, chunk_rows=2)
+        self.assertEqual(self.committed['row_num'], 5)
+        self.assertIsNone(self.committed['completed_at'])
+
+        self.fail_on_merge = None
+        stats = site_loader.load_csv_file(self.conn, self.path, chunk_rows=2)
+        self.assertEqual(stats['resumed_from_row'], 6)
+        self.assertEqual(stats['rows'], 3)
+        self.assertEqual(self.merged_rows, [[2, 3], [4, 5], [6, 7], [8]])
+        self.assertEqual(self.committed['rows_loaded'], 7)
+        self.assertEqual(self.committed['byte_offset'], os.path.getsize(self.path))
+        self.assertIsNotNone(self.committed['completed_at'])
+
+    def test_completed_file_is_read_again_from_the_start(self):
+        site_loader.load_csv_file(self.conn, self.path, chunk_rows=3)
+        self.merged_rows.clear()
+        stats = site_loader.load_csv_file(self.conn, self.path, chunk_rows=3)
+        self.assertIsNone(stats['resumed_from_row'])
+        self.assertEqual(stats['rows'], 7)
+        self.assertEqual(self.merged_rows, [[2, 3, 4], [5, 6, 7], [8]])
+
+    def test_restart_ignores_an_interrupted_load(self):
+        self.fail_on_merge = 6
+        with self.assertRaises(RuntimeError):
+            site_loader.load_csv_file(self.conn, self.path, chunk_rows=2)
+        self.fail_on_merge = None
+        self.merged_rows.clear()
+        stats = site_loader.load_csv_file(self.conn, self.path, chunk_rows=2, restart=True)
+        self.assertIsNone(stats['resumed_from_row'])
+        self.assertEqual(stats['rows'], 7)
+
+
+if __name__ == '__main__':
+    unittest.main()